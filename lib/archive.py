@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+
+import cv2
+
+from lib.layouts import extension, image_size
+from lib.ocr import decode
+from lib.writer import Writer
+
+
+class Archive:
+    # drop images and their crops stored by content hash (objects/ab/abcd....webp) so
+    # the same image is only ever stored once, plus index.jsonl saying which drop used
+    # which objects and what was read on it. the oldest used objects are deleted once
+    # the archive is bigger than max_bytes. everything is written on a thread, the
+    # loop only hashes the drop and queues it. an empty root keeps nothing. drops whose
+    # files can't be written go to on_error, the archive carries on with the next ones
+    def __init__(self, root="archive", max_bytes=500 * 1024 * 1024, on_error=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects = OrderedDict()
+        self.size = 0
+        self.loaded = False
+        self.writer = Writer(self._write, on_error=on_error)
+
+    def start(self):
+        if self.root:
+            self.writer.start()
+
+    def save(self, drop, **fields):
+        # returns where the drop image will be, relative to root
+        if not self.root or drop.data is None:
+            return None
+        data = bytes(drop.data)
+        key = f"{hashlib.sha256(data).hexdigest()}.{extension(data)}"
+        boxes = [
+            (i, kind, box) for kind, regions in (("top", drop.tops), ("bottom", drop.bottoms), ("print", drop.prints))
+            for i, box in enumerate(regions)
+        ]
+        record = {
+            "time": datetime.now().isoformat(timespec="seconds"), "drop": drop.message.id,
+            "channel": drop.message.channel.id, "layout": drop.layout.name if drop.layout else None,
+            "image": self.path(key), "characters": drop.charlist, "animes": drop.anilist,
+            "prints": drop.print_text
+        }
+        record.update(fields)
+        self.writer.put(("drop", record, key, data, drop.img, boxes))
+        return record["image"]
+
+    def collected(self, drop_id, character, code):
+        if self.root:
+            self.writer.put(("collected", {"drop": drop_id, "collected": character, "code": code}))
+
+    def path(self, key):
+        return os.path.join("objects", key[:2], key).replace(os.sep, "/")
+
+    def _load(self):
+        # what's already on disk, least recently used first (a reused object gets its mtime bumped)
+        found = []
+        for folder, _, files in os.walk(os.path.join(self.root, "objects")):
+            for name in files:
+                if not name.endswith(".tmp"):
+                    st = os.stat(os.path.join(folder, name))
+                    found.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(found):
+            self.objects[name] = size
+            self.size += size
+        self.loaded = True
+
+    def _put(self, key, data):
+        path = os.path.join(self.root, self.path(key))
+        if key in self.objects:
+            self.objects.move_to_end(key)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+        self.objects[key] = len(data)
+        self.size += len(data)
+
+    def _crop(self, region):
+        # lossless webp keeps the crops small and exact, they're the ocr training data
+        ok, encoded = cv2.imencode(".webp", region, [cv2.IMWRITE_WEBP_QUALITY, 101])
+        data = encoded.tobytes()
+        return f"{hashlib.sha256(data).hexdigest()}.webp", data
+
+    def _write(self, items):
+        if not self.loaded:
+            self._load()
+        lines = []
+        for item in items:
+            if item[0] == "collected":
+                lines.append(item[1])
+                continue
+            _, record, key, data, img, boxes = item
+            self._put(key, data)
+            if img is None and image_size(data) is not None:
+                img = decode(data)
+            crops = {}
+            for i, kind, box in boxes if img is not None else ():
+                region = img[box]
+                if region.size:
+                    crop_key, crop = self._crop(region)
+                    self._put(crop_key, crop)
+                    crops.setdefault(str(i), {})[kind] = self.path(crop_key)
+            record["crops"] = crops
+            lines.append(record)
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, "index.jsonl"), "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.objects:
+            key, size = self.objects.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(os.path.join(self.root, self.path(key)))
+            except OSError:
+                pass
+
+    async def close(self):
+        await self.writer.close()
@@ -0,0 +1,99 @@
+import Levenshtein
+
+from lib.imagehash import HashMatrix, dct_hash
+from lib.jsonfile import JSONBacked, read_json
+
+
+def fingerprint(art):
+    # 256 bit hash of a card's artwork (the "art" region in lib/layouts.json), the same
+    # art re-encoded stays within a few bits, different art is ~128 apart
+    return dct_hash(art, (64, 64), (16, 16))
+
+
+def confirmed(read, character):
+    # karuta's "took the card" name against what ocr read on the grabbed card, a name
+    # that has nothing to do with the read means the message was about another drop
+    return read is None or Levenshtein.ratio(read.lower(), character.lower()) >= 0.5
+
+
+class ArtIndex(JSONBacked):
+    # cards whose name and anime are known, by the fingerprint of their artwork. a card
+    # karuta has the same artwork for is named without reading any text. only grabbed
+    # cards whose name karuta confirmed go in (see Pipeline.confirm and tools.build_art_index)
+    def __init__(self, path="temp/art_index.json", distance=16, margin=32, size=50000):
+        self.path = path
+        self.distance = distance
+        self.margin = margin
+        self.size = size
+        self.hashes = []
+        self.labels = []
+        self.matrix = HashMatrix()
+        self.hits = 0
+        self.misses = 0
+        self.dirty = 0
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def nearest(self, h, within):
+        # (distance, index) of the closest entry per label up to `within` bits, closest first
+        if not self.hashes:
+            return []
+        distances = self.matrix.distances(h)
+        # almost nothing is this close, so only a handful of entries get sorted
+        order = (distances <= within).nonzero()[0]
+        order = order[distances[order].argsort(kind="stable")]
+        out = []
+        seen = set()
+        for i in order:
+            label = self.labels[i]
+            if label not in seen:
+                seen.add(label)
+                out.append((int(distances[i]), int(i)))
+        return out
+
+    def lookup(self, h):
+        # (character, anime) when the closest artwork is close and no other card is nearly
+        # as close, else None
+        found = self.nearest(h, self.distance + self.margin)
+        if found and found[0][0] <= self.distance and (len(found) == 1 or found[1][0] - found[0][0] >= self.margin):
+            self.hits += 1
+            return self.labels[found[0][1]]
+        self.misses += 1
+        return None
+
+    def add(self, h, character, anime):
+        if not character or not anime:
+            return False
+        label = (character, anime)
+        found = self.nearest(h, self.distance // 4)
+        # the same artwork again adds nothing
+        if found and self.labels[found[0][1]] == label:
+            return False
+        self._append([h], [label])
+        self.dirty += 1
+        return True
+
+    def _append(self, hashes, labels):
+        self.matrix.append(hashes)
+        self.hashes += hashes
+        self.labels += labels
+        if len(self.hashes) > self.size:
+            # the oldest tenth goes at once instead of shifting the columns every add
+            cut = len(self.hashes) - self.size + self.size // 10
+            self.matrix.cut(cut)
+            del self.hashes[:cut], self.labels[:cut]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return f"Art index {len(self.hashes)} cards, {self.hits}/{total} named without ocr"
+
+    def load(self):
+        try:
+            rows = [(int(h, 16), (character, anime)) for h, character, anime in read_json(self.path) or []]
+        except (ValueError, TypeError):
+            return
+        self._append([h for h, _ in rows], [label for _, label in rows])
+
+    def rows(self):
+        return [[format(h, "x"), character, anime] for h, (character, anime) in zip(self.hashes, self.labels)]
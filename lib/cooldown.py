@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+
+class Cooldowns:
+    # grab and drop cooldowns kept as deadlines on a monotonic clock, so nothing has to
+    # tick them down. waiters sleep until the deadline and are woken early whenever a
+    # deadline moves. clock can be any function returning seconds, a fake clock calls
+    # tick() after moving so waiters look at it again (see tools.check_cooldowns)
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.deadlines = {}
+        self.moved = asyncio.Event()
+
+    def remaining(self, name):
+        return max(0.0, self.deadlines.get(name, 0.0) - self.clock())
+
+    def ready(self, name):
+        return self.remaining(name) <= 0
+
+    def add(self, name, seconds):
+        # the old `timer += seconds`, counting from now if the cooldown had already run out
+        self._move(name, max(self.deadlines.get(name, 0.0), self.clock()) + seconds)
+
+    def set(self, name, seconds):
+        self._move(name, self.clock() + seconds)
+
+    def reset(self, name):
+        self._move(name, 0.0)
+
+    def tick(self):
+        # the clock jumped, every waiter checks its deadline again
+        moved, self.moved = self.moved, asyncio.Event()
+        moved.set()
+
+    def _move(self, name, deadline):
+        self.deadlines[name] = deadline
+        # wake everyone waiting on the old event, later waiters get a fresh one
+        self.tick()
+
+    async def changed(self, timeout=None):
+        # True if a deadline moved, False if timeout ran out first
+        try:
+            await asyncio.wait_for(self.moved.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def wait(self, *names):
+        # returns once every named cooldown has run out
+        while True:
+            left = max(self.remaining(name) for name in names)
+            if left <= 0:
+                return
+            await self.changed(left)
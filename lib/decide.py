@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+# what a card can be grabbed for, best first
+TIERS = ("watermelon", "character", "anime", "print")
+RANK = {reason: len(TIERS) - n for n, reason in enumerate(TIERS)}
+
+# everything known about one card. each field is None until the text it depends on has
+# been read: character / anime are keyword hits, charblacklisted / aniblacklisted the
+# fuzzy blacklist hits, listed the exact blacklist check prints use, print the number
+Card = namedtuple("Card", ["character", "anime", "charblacklisted", "aniblacklisted", "listed", "print"])
+UNREAD = Card(None, None, None, None, None, None)
+
+# grab is the card (None for nothing), reason why, ranking every card that qualifies as
+# (card, reason) best first, final False while a card that hasn't been read far enough
+# could still beat the pick. contenders are those cards
+Decision = namedtuple("Decision", ["grab", "reason", "ranking", "final", "contenders"])
+
+NOTHING = (0, 0, 0)
+
+
+def key(i, reason, card):
+    # higher is better: the tier, then the lower print, then the card further left
+    if reason is None:
+        return NOTHING
+    lowest = -card.print if reason == "print" and card.print is not None else 0
+    return RANK[reason], lowest, -i
+
+
+def qualifies(card, print_number):
+    # the best reason the card is grabbed for with what's known, None if none yet
+    clean = card.charblacklisted is False and card.aniblacklisted is False
+    if card.character and clean:
+        return "character"
+    if card.anime and clean:
+        return "anime"
+    if print_number is not None and card.listed is False and card.print is not None and card.print <= print_number:
+        return "print"
+    return None
+
+
+def could(card, print_number):
+    # the best reason the card could still be grabbed for once everything is read
+    clean = not card.charblacklisted and not card.aniblacklisted
+    if card.character is not False and clean:
+        return "character"
+    if card.anime is not False and clean:
+        return "anime"
+    if print_number is not None and not card.listed and (card.print is None or card.print <= print_number):
+        return "print"
+    return None
+
+
+def optimistic(i, card, print_number):
+    reason = could(card, print_number)
+    if reason == "print" and card.print is None:
+        return RANK[reason], 0, -i
+    return key(i, reason, card)
+
+
+def choose(cards, print_number=None, watermelon=None):
+    # every card against every rule at once. pure, only looks at its arguments
+    if watermelon is not None:
+        return Decision(watermelon, "watermelon", [(watermelon, "watermelon")], True, [])
+    known = [(key(i, reason, card), i, reason) for i, card in enumerate(cards)
+             for reason in [qualifies(card, print_number)] if reason is not None]
+    known.sort(reverse=True)
+    best = known[0][0] if known else NOTHING
+    contenders = [
+        i for i, card in enumerate(cards)
+        if qualifies(card, print_number) != could(card, print_number) and optimistic(i, card, print_number) > best
+    ]
+    ranking = [(i, reason) for _, i, reason in known]
+    grab, reason = ranking[0] if ranking else (None, None)
+    return Decision(grab, reason, ranking, not contenders, contenders)
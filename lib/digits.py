@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+
+import cv2
+import numpy as np
+
+GLYPH_H = 8
+GLYPH_W = 7
+INK = 70
+# mean abs difference (0-1) above which a glyph isn't any digit we know
+MAX_DISTANCE = 0.2
+
+
+def _band(strip):
+    # the print is light text on a dark label, find the row band of the digits
+    # from the connected components that are digit sized and don't touch the edge
+    g = strip.astype(np.float32)
+    if not g.size:
+        return g, None, None
+    if g.mean() > 128:
+        g = 255 - g
+    n, _, stats, _ = cv2.connectedComponentsWithStats((g > INK).astype(np.uint8), connectivity=8)
+    tall = [
+        (x, y, h) for x, y, w, h, _ in stats[1:]
+        if y > 0 and y + h < strip.shape[0] and GLYPH_H - 2 <= h <= GLYPH_H + 2 and w <= GLYPH_W + 1
+    ]
+    if not tall:
+        return g, None, None
+    top = int(sorted(y for _, y, _ in tall)[len(tall) // 2])
+    return g, top, min(x for x, _, _ in tall)
+
+
+def segment(strip):
+    # column projection over the digit band, runs of inked columns are glyphs, a
+    # short run (the " · " before the edition) ends the print number
+    g, top, left = _band(strip)
+    if top is None:
+        return []
+    band = g[top:top + GLYPH_H, left:]
+    ink = band > INK
+    cols = ink.any(0)
+    glyphs = []
+    x = 0
+    while x < len(cols):
+        if not cols[x]:
+            x += 1
+            continue
+        start = x
+        while x < len(cols) and cols[x]:
+            x += 1
+        rows = np.flatnonzero(ink[:, start:x].any(1))
+        if rows[-1] - rows[0] < 3:
+            break
+        glyphs.append(band[:, start:x])
+    return glyphs
+
+
+def normalize(glyph):
+    lo, hi = glyph.min(), glyph.max()
+    g = np.clip((glyph - lo) / max(hi - lo, 1), 0, 1)
+    out = np.zeros((GLYPH_H, GLYPH_W), np.float32)
+    w = min(g.shape[1], GLYPH_W)
+    x = (GLYPH_W - w) // 2
+    out[:g.shape[0], x:x + w] = g[:GLYPH_H, :w]
+    return out
+
+
+class DigitReader:
+    # the seed templates are fixed, what tesseract teaches is kept apart from them, the
+    # newest `max_templates` per digit
+    def __init__(self, seed="lib/digits.json", path="temp/digits.json", max_templates=8, min_confidence=0.5):
+        self.seed = seed
+        self.path = path
+        self.max_templates = max_templates
+        self.min_confidence = min_confidence
+        self.seeded = {}
+        self.templates = {}
+        self.learned = 0
+        # reads and learns run on threads, a read must never see half of a restack
+        self.lock = threading.Lock()
+        self.labels = np.array([])
+        self.bank = np.zeros((0, 3, GLYPH_H, GLYPH_W), np.float32)
+
+    def _stack(self):
+        labels = []
+        arrays = []
+        for templates in (self.seeded, self.templates):
+            for digit, glyphs in templates.items():
+                for glyph in glyphs:
+                    labels.append(digit)
+                    arrays.append(glyph)
+        # every template also shifted one column left and right
+        if arrays:
+            base = np.stack(arrays)
+            bank = np.stack([np.roll(base, s, axis=2) for s in (-1, 0, 1)], 1)
+        else:
+            bank = np.zeros((0, 3, GLYPH_H, GLYPH_W), np.float32)
+        self.labels, self.bank = np.array(labels), bank
+
+    def classify(self, glyphs):
+        # all glyphs of a strip against all templates (and their shifts) in one go,
+        # confidence is how much closer the best digit is than the best other digit
+        with self.lock:
+            labels, bank = self.labels, self.bank
+        if not len(labels) or not glyphs:
+            return [], []
+        norm = np.stack([normalize(g) for g in glyphs])
+        dist = np.abs(bank[None] - norm[:, None, None]).mean((3, 4)).min(2)
+        best = dist.argmin(1)
+        digits = labels[best]
+        best_dist = dist[np.arange(len(glyphs)), best]
+        other = np.where(labels[None] == digits[:, None], np.inf, dist).min(1)
+        other = np.where(np.isfinite(other), other, 1.0)
+        confidence = np.where(best_dist > MAX_DISTANCE, 0.0, (other - best_dist) / np.maximum(other, 1e-6))
+        return list(digits), [float(c) for c in confidence]
+
+    def read(self, strip):
+        # returns the print number and a confidence per digit, "" if nothing was found
+        digits, confidence = self.classify(segment(strip))
+        return "".join(digits), confidence
+
+    def learn(self, strip, text):
+        # tesseract's read of a strip we weren't sure about. it's only trusted when it agrees
+        # with every digit we were sure of (and there was at least one), then the digits we
+        # weren't sure of are kept. a misread never gets to become a template
+        text = text.strip()
+        glyphs = segment(strip)
+        if not text.isdigit() or len(text) != len(glyphs):
+            return False
+        digits, confidence = self.classify(glyphs)
+        sure = [i for i, c in enumerate(confidence) if c >= self.min_confidence]
+        if not sure or any(digits[i] != text[i] for i in sure):
+            return False
+        new = [(digit, glyph) for i, (digit, glyph) in enumerate(zip(text, glyphs)) if i not in sure]
+        if not new:
+            return False
+        with self.lock:
+            for digit, glyph in new:
+                known = self.templates.setdefault(digit, [])
+                known.append(normalize(glyph))
+                del known[:-self.max_templates]
+            self.learned += 1
+            self._stack()
+        return True
+
+    def _read_file(self, path, templates, limit=None):
+        if not path or not os.path.isfile(path):
+            return
+        with open(path) as f:
+            for digit, glyphs in json.load(f).items():
+                known = templates.setdefault(digit, [])
+                known.extend(np.array(g, np.float32) for g in glyphs)
+                if limit:
+                    del known[:-limit]
+
+    def load(self):
+        self._read_file(self.seed, self.seeded)
+        try:
+            self._read_file(self.path, self.templates, self.max_templates)
+        except (ValueError, TypeError):
+            pass
+        self._stack()
+
+    def save(self):
+        if not self.learned:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({d: [np.round(g, 3).tolist() for g in glyphs] for d, glyphs in self.templates.items()}, f)
@@ -0,0 +1,56 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import aiohttp
+
+
+def rendition(url, fmt=None):
+    # discord's media proxy can hand back the attachment already converted,
+    # the signed query params (ex, is, hm) have to stay on the url
+    if not fmt:
+        return url
+    parts = urlsplit(url)
+    netloc = parts.netloc
+    if netloc == "cdn.discordapp.com":
+        netloc = "media.discordapp.net"
+    query = dict(parse_qsl(parts.query))
+    query["format"] = fmt
+    return urlunsplit((parts.scheme, netloc, parts.path, urlencode(query), parts.fragment))
+
+
+class Downloader:
+    def __init__(self, timeout=10, pool_size=8, chunk_size=65536):
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=timeout / 2)
+        self.pool_size = pool_size
+        self.chunk_size = chunk_size
+        self.session = None
+
+    def _session(self):
+        # one keep-alive pool for the whole bot, created lazily so it binds to the running loop
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def fetch(self, url):
+        async with self._session().get(url) as resp:
+            resp.raise_for_status()
+            buf = bytearray()
+            async for chunk in resp.content.iter_chunked(self.chunk_size):
+                buf += chunk
+            return bytes(buf)
+
+    async def fetch_image(self, url, fmt=None):
+        alt = rendition(url, fmt)
+        if alt != url:
+            try:
+                return await self.fetch(alt)
+            except aiohttp.ClientResponseError:
+                pass
+        return await self.fetch(url)
+
+    async def text(self, url):
+        return (await self.fetch(url)).decode("utf-8", "replace")
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
@@ -0,0 +1,58 @@
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime
+
+from lib.writer import Writer
+
+
+class EventLog:
+    # on_message only puts events on a queue, they're written in batches as json lines
+    # (and optionally the old log.txt lines) off the loop. events that can't be written
+    # (a full disk, a log.txt another program has open) go to on_error and are lost
+    def __init__(self, path="logs/events.jsonl", max_bytes=5 * 1024 * 1024, backups=5,
+                 text_path="log.txt", timestamp=True, batch=200, interval=1.0, on_error=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.text_path = text_path
+        self.timestamp = timestamp
+        self.writer = Writer(self._write, batch, interval, on_error=on_error)
+
+    def event(self, kind, text=None, **fields):
+        now = datetime.now()
+        record = {"time": now.isoformat(timespec="milliseconds"), "event": kind}
+        record.update(fields)
+        if text is not None and self.timestamp:
+            text = f"{now.strftime('%H:%M:%S')} - {text}"
+        self.writer.put((record, text))
+
+    def start(self):
+        self.writer.start()
+
+    def _write(self, items):
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record, _ in items)
+            if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+        lines = [text + "\n" for _, text in items if text is not None]
+        if self.text_path and lines:
+            with open(self.text_path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    def _rotate(self):
+        # events.jsonl -> events.jsonl.1.gz -> events.jsonl.2.gz ... up to `backups`
+        for i in range(self.backups - 1, 0, -1):
+            old = f"{self.path}.{i}.gz"
+            if os.path.exists(old):
+                os.replace(old, f"{self.path}.{i + 1}.gz")
+        if self.backups:
+            with open(self.path, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+
+    async def close(self):
+        await self.writer.close()
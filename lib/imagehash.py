@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+# hashes are 256 bits, kept as 4 uint64 words for the distance scans
+WORDS = 4
+# bits set in each byte value, for numpy < 2 which has no bitwise_count
+BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], np.uint8)
+
+
+def dct_hash(region, size, low):
+    # the region shrunk to `size` (w, h), then the `low` (rows, cols) lowest dct
+    # frequencies each above or below their median. the same image re-encoded lands
+    # within a few bits, different images are around half the bits apart
+    small = cv2.resize(region, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+    coefficients = cv2.dct(small)[:low[0], :low[1]].flatten()
+    return int.from_bytes(np.packbits(coefficients > np.median(coefficients[1:])).tobytes(), "big")
+
+
+def popcount(a):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(a)
+    return BYTE_BITS[np.ascontiguousarray(a).view(np.uint8)].reshape(a.shape + (-1,)).sum(-1, dtype=np.uint8)
+
+
+def words(h):
+    return [np.uint64((h >> (64 * (WORDS - 1 - i))) & 0xFFFFFFFFFFFFFFFF) for i in range(WORDS)]
+
+
+class HashMatrix:
+    # one column per hash and a row per word, so the distance of a hash to every
+    # column is 4 contiguous xor+popcounts. grown in steps so adding doesn't copy it all
+    def __init__(self):
+        self.matrix = np.zeros((WORDS, 64), np.uint64)
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def append(self, hashes):
+        if self.n + len(hashes) > self.matrix.shape[1]:
+            grown = np.zeros((WORDS, max(2 * self.matrix.shape[1], self.n + len(hashes))), np.uint64)
+            grown[:, :self.n] = self.matrix[:, :self.n]
+            self.matrix = grown
+        self.matrix[:, self.n:self.n + len(hashes)] = np.array([words(h) for h in hashes], np.uint64).reshape(-1, WORDS).T
+        self.n += len(hashes)
+
+    def set(self, i, h):
+        self.matrix[:, i] = words(h)
+
+    def cut(self, n):
+        # the first n columns go in one move
+        self.matrix[:, :self.n - n] = self.matrix[:, n:self.n]
+        self.n -= n
+
+    def distances(self, h):
+        # bits differing from h, one per column
+        q = words(h)
+        out = popcount(self.matrix[0, :self.n] ^ q[0]).astype(np.uint16)
+        for i in range(1, WORDS):
+            out += popcount(self.matrix[i, :self.n] ^ q[i])
+        return out
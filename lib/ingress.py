@@ -0,0 +1,58 @@
+KARUTA = 646937666251915264
+# the gateway events that only ever matter for the watched channels
+EVENTS = (
+    "MESSAGE_CREATE", "MESSAGE_UPDATE", "MESSAGE_DELETE", "MESSAGE_DELETE_BULK",
+    "MESSAGE_REACTION_ADD", "MESSAGE_REACTION_REMOVE", "MESSAGE_REACTION_REMOVE_ALL",
+    "MESSAGE_REACTION_REMOVE_EMOJI", "TYPING_START",
+)
+
+
+class Ingress:
+    # sits in front of discord.py's gateway parsers and looks at the raw payload, so
+    # messages, reactions and typing from channels we don't watch are thrown away
+    # before a Message/Member is built and cached for them. ids in payloads are
+    # strings, they're compared as strings against a set made once
+    def __init__(self, channels, author=KARUTA):
+        self.author = str(author)
+        self.channels = frozenset()
+        self.set_channels(channels)
+        self.wrapped = {}
+        self.seen = 0
+        self.dropped = 0
+
+    def set_channels(self, channels):
+        self.channels = frozenset(str(c) for c in channels)
+
+    def wants(self, event, data):
+        if event == "TYPING_START" or data.get("channel_id") not in self.channels:
+            return False
+        if event == "MESSAGE_CREATE":
+            return data.get("author", {}).get("id") == self.author
+        if event == "MESSAGE_UPDATE":
+            # partial updates (embeds resolving) come without an author
+            author = data.get("author")
+            return author is None or author.get("id") == self.author
+        return True
+
+    def install(self, parsers):
+        # parsers is ConnectionState.parsers, the gateway looks events up in that same dict
+        for event in EVENTS:
+            parser = parsers.get(event)
+            if parser is not None and event not in self.wrapped:
+                self.wrapped[event] = parser
+                parsers[event] = self._wrap(event, parser)
+
+    def uninstall(self, parsers):
+        parsers.update(self.wrapped)
+        self.wrapped = {}
+
+    def _wrap(self, event, parser):
+        wants = self.wants
+
+        def parse(data):
+            self.seen += 1
+            if wants(event, data):
+                return parser(data)
+            self.dropped += 1
+
+        return parse
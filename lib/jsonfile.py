@@ -0,0 +1,44 @@
+import asyncio
+import json
+import os
+
+
+def read_json(path):
+    # None when the file is missing or broken, the caller starts empty then
+    if not path or not os.path.isfile(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def write_json(path, data):
+    # written next to the file and swapped in, so a crash never leaves half of it
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class JSONBacked:
+    # what the ocr cache and the art index share for keeping themselves in `path`
+    # between restarts: their rows() is the file's content, dirty counts changes
+    # since it was last written
+    path = ""
+    dirty = 0
+
+    def _snapshot(self):
+        self.dirty = 0
+        return self.rows()
+
+    async def flush(self):
+        # rows are copied on the loop, the file is written on a thread
+        if self.path and self.dirty:
+            await asyncio.to_thread(write_json, self.path, self._snapshot())
+
+    def save(self):
+        if self.path and self.dirty:
+            write_json(self.path, self._snapshot())
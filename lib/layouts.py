@@ -0,0 +1,72 @@
+import json
+
+ANY = (0, 1 << 30)
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+def extension(data):
+    return "png" if data[:8] == PNG else "webp"
+
+
+def image_size(data):
+    # (width, height) from the file header of a webp or png, None for anything else
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        chunk = data[12:16]
+        if chunk == b"VP8X":
+            return 1 + int.from_bytes(data[24:27], "little"), 1 + int.from_bytes(data[27:30], "little")
+        if chunk == b"VP8 " and data[23:26] == b"\x9d\x01\x2a":
+            return (
+                int.from_bytes(data[26:28], "little") & 0x3fff,
+                int.from_bytes(data[28:30], "little") & 0x3fff
+            )
+        if chunk == b"VP8L" and data[20:21] == b"\x2f":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        return None
+    if data[:8] == PNG:
+        return int.from_bytes(data[16:20], "big"), int.from_bytes(data[20:24], "big")
+    return None
+
+
+class Layout:
+    # one drop format: where the cards are and where every region is on each card.
+    # all boxes are slices on the whole drop image, built once when the registry loads
+    def __init__(self, spec, regions):
+        self.name = spec["name"]
+        self.width = tuple(spec.get("width", ANY))
+        self.height = tuple(spec.get("height", ANY))
+        self.cards = spec["cards"]
+        self.stride = spec["stride"]
+        self.watermelon = spec.get("watermelon")
+        self.card_boxes = [
+            (slice(0, spec["card_height"]), slice(n * self.stride, (n + 1) * self.stride))
+            for n in range(self.cards)
+        ]
+        self.boxes = {
+            region: [
+                (slice(*rows), slice(n * self.stride + cols[0], n * self.stride + cols[1]))
+                for n in range(self.cards)
+            ]
+            for region, (rows, cols) in regions.items()
+        }
+
+    def matches(self, width, height):
+        return self.width[0] <= width <= self.width[1] and self.height[0] <= height <= self.height[1]
+
+    def count(self, width):
+        # never crop past the right edge of an image that isn't the size we expected
+        return min(self.cards, max(1, width // self.stride))
+
+
+class Layouts:
+    # the formats from lib/layouts.json, the first one whose width/height ranges fit wins
+    def __init__(self, path="lib/layouts.json"):
+        with open(path) as f:
+            spec = json.load(f)
+        self.layouts = [Layout(layout, spec["regions"][layout["regions"]]) for layout in spec["layouts"]]
+
+    def classify(self, width, height):
+        for layout in self.layouts:
+            if layout.matches(width, height):
+                return layout
+        return self.layouts[-1]
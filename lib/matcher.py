@@ -0,0 +1,110 @@
+from collections import namedtuple
+
+import Levenshtein
+import numpy as np
+
+Match = namedtuple("Match", ["word", "score"])
+NO_MATCH = Match(None, 0.0)
+# float slack so the prefilter never drops a word Levenshtein.ratio would accept
+SLACK = 1e-9
+
+
+class KeywordIndex:
+    # Levenshtein.ratio is 1 - indel / (len(a) + len(b)), and the indel distance can
+    # never be smaller than the difference between the two strings' character counts.
+    # That gives an upper bound on the ratio for every word at once from a count
+    # matrix, only words whose bound reaches the threshold get the real ratio.
+    # The results are the same as scanning the whole list with Levenshtein.ratio.
+    def __init__(self, words):
+        self.words = []
+        self.columns = {}
+        self.lengths = np.zeros(0, np.int32)
+        self.counts = np.zeros((0, 0), np.int16)
+        self.columns_t = self.counts.T
+        self.update(words)
+
+    def update(self, words):
+        # swaps the list for a new one, only the rows of added words are counted and
+        # removed words are dropped, returns (added, removed)
+        words = list(words)
+        wanted = set(words)
+        keep = [i for i, w in enumerate(self.words) if w in wanted]
+        have = {self.words[i] for i in keep}
+        added = [w for w in dict.fromkeys(words) if w not in have]
+        removed = len(self.words) - len(keep)
+        if not added and not removed:
+            return 0, 0
+        for c in "".join(added):
+            if c not in self.columns:
+                self.columns[c] = len(self.columns)
+        rows = np.zeros((len(added), len(self.columns)), np.int16)
+        for row, word in enumerate(added):
+            for c in word:
+                rows[row, self.columns[c]] += 1
+        kept = self.counts[keep]
+        kept = np.pad(kept, ((0, 0), (0, len(self.columns) - kept.shape[1])))
+        self.words = [self.words[i] for i in keep] + added
+        self.lengths = np.concatenate([self.lengths[keep], np.array([len(w) for w in added], np.int32)])
+        self.counts = np.vstack([kept, rows])
+        self.columns_t = np.ascontiguousarray(self.counts.T)
+        return len(added), removed
+
+    def __len__(self):
+        return len(self.words)
+
+    def bounds(self, texts):
+        # sum|a_c - b_c| == len(a) + len(b) - 2 * sum(min(a_c, b_c)), and the min only
+        # needs the handful of columns the ocr string actually uses
+        out = np.empty((len(texts), len(self.words)))
+        for row, text in enumerate(texts):
+            cols = {}
+            for c in text:
+                col = self.columns.get(c)
+                if col is not None:
+                    cols[col] = cols.get(col, 0) + 1
+            total = self.lengths + len(text)
+            if cols:
+                shared = np.minimum(self.columns_t[list(cols)], np.array(list(cols.values()), np.int16)[:, None])
+                diff = total - 2 * shared.sum(0, dtype=np.int32)
+            else:
+                diff = total
+            out[row] = np.where(total > 0, 1 - diff / np.maximum(total, 1), 1.0)
+        return out
+
+    def best(self, texts, threshold):
+        if not self.words:
+            return [NO_MATCH] * len(texts)
+        bounds = self.bounds(texts)
+        results = []
+        for text, row in zip(texts, bounds):
+            best = NO_MATCH
+            for j in np.flatnonzero(row >= threshold - SLACK):
+                score = Levenshtein.ratio(self.words[j], text)
+                if score >= threshold and (best.word is None or score > best.score):
+                    best = Match(self.words[j], score)
+            results.append(best)
+        return results
+
+    def contains(self, text, threshold):
+        # same answer as api.isSomething(text, words, threshold)
+        return self.best([text], threshold)[0].word is not None
+
+
+class Matcher:
+    def __init__(self, chars, animes, charblacklist, aniblacklist):
+        self.chars = KeywordIndex(chars)
+        self.animes = KeywordIndex(animes)
+        self.charblacklist = KeywordIndex(charblacklist)
+        self.aniblacklist = KeywordIndex(aniblacklist)
+        self.exact_blacklist = (set(charblacklist), set(aniblacklist))
+
+    def update(self, name, words):
+        # name is chars, animes, charblacklist or aniblacklist
+        changes = getattr(self, name).update(words)
+        if name in ("charblacklist", "aniblacklist"):
+            self.exact_blacklist = (set(self.charblacklist.words), set(self.aniblacklist.words))
+        return changes
+
+    def blacklisted(self, character, anime):
+        # the exact check the print hits use, no fuzzy matching
+        return character in self.exact_blacklist[0] or anime in self.exact_blacklist[1]
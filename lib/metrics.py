@@ -0,0 +1,104 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from aiohttp import web
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    # cumulative buckets for prometheus plus the last `window` values for quantiles
+    def __init__(self, window=500):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q):
+        if not self.recent:
+            return 0.0
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class Metrics:
+    def __init__(self, window=500):
+        self.window = window
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.runner = None
+
+    def observe(self, stage, seconds):
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = Histogram(self.window)
+        hist.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name, func):
+        # func is called on every scrape, so the value is never stale
+        self.gauges[name] = func
+
+    def render(self):
+        lines = [
+            "# HELP karuta_stage_seconds Time spent in each stage of handling a drop",
+            "# TYPE karuta_stage_seconds histogram"
+        ]
+        for stage, hist in sorted(self.stages.items()):
+            for bound, count in zip(BUCKETS, hist.counts):
+                lines.append(f'karuta_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'karuta_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+            lines.append(f'karuta_stage_seconds_sum{{stage="{stage}"}} {hist.sum:.6f}')
+            lines.append(f'karuta_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+        lines.append(f"# HELP karuta_stage_recent_seconds Quantiles over the last {self.window} observations per stage")
+        lines.append("# TYPE karuta_stage_recent_seconds gauge")
+        for stage, hist in sorted(self.stages.items()):
+            for q in QUANTILES:
+                lines.append(f'karuta_stage_recent_seconds{{stage="{stage}",quantile="{q}"}} {hist.quantile(q):.6f}')
+        seen = set()
+        for (name, labels), value in sorted(self.counters.items()):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# TYPE karuta_{name} counter")
+            label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+            lines.append(f"karuta_{name}{{{label_text}}} {value}" if label_text else f"karuta_{name} {value}")
+        for name, func in sorted(self.gauges.items()):
+            lines.append(f"# TYPE karuta_{name} gauge")
+            lines.append(f"karuta_{name} {func()}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host="127.0.0.1", port=9464):
+        async def handler(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handler)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
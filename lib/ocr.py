@@ -1,67 +1,100 @@
 # all of this code was taken from https://github.com/riccardolunardi/KarutaBotHack
-try:
-    from PIL import Image
-except ImportError:
-    import Image
+import os
+import re
+from bisect import bisect_right
 
 import cv2
-
-
-def filelength(filepath):
-    im = cv2.imread(filepath)
-    return im.shape[1]
-
-
-async def get_card(path, input0, n_img):
-    img0 = cv2.imread(input0)
-    crop_img = img0[0: 0 + 414, n_img * 278: n_img * 278 + 278]
-    crop_img = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite(path, crop_img)
-
-
-async def tofu_get_card(path, input0, n_img):
-    img0 = cv2.imread(input0)
-    crop_img = img0[0:480, n_img * 313:313 + 313 * n_img]
-    cv2.imwrite(path, crop_img)
-
-
-async def get_top(input0, output):
-    img0 = cv2.imread(input0)
-    crop_img = img0[65:105, 45:230]
-    gray = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite(output, gray)
-
-
-async def tofu_get_top(input0, output):
-    img0 = cv2.imread(input0)
-    crop_img = img0[27:77, 54:259]
-    gray = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite(output, gray)
-
-
-async def get_bottom(input0, output):
-    img = cv2.imread(input0)
-    crop_img = img[55 + 255: 110 + 255, 45:235]
-    gray = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite(output, gray)
-
-
-async def tofu_get_bottom(input0, output):
-    img = cv2.imread(input0)
-    crop_img = img[400:452, 55:260]
-    gray = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite(output, gray)
-
-
-async def get_print(input0, output):
-    img0 = cv2.imread(input0)
-    crop_img = img0[372:385, 145:203]
-    gray = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite(output, gray)
-
-
-async def tofu_get_print(input0, output):
-    img0 = cv2.imread(input0)
-    crop_img = img0[360:387, 209:265]
-    gray = cv2.cvtColor(crop_img, cv2.COLOR_BGR2GRAY)
-    cv2.imwrite(output, gray)
+import numpy as np
+import pytesseract
+
+from lib.preprocess import preprocess
+
+NAME_CONFIG = r"--psm 6 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz@&0123456789/:- "
+PRINT_CONFIG = r"--psm 7 --oem 3 -c tessedit_char_whitelist=0123456789"
+TILE_PAD = 16
+
+
+def decode(data):
+    # drops are only ever read in grayscale, so decode straight to one channel
+    # and cut every region (see lib/layouts) as a view into this array
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+
+
+def save_drop(folder, data, cards, tops, bottoms, prints):
+    # only used when save_temp_images is on, mirrors the old temp layout
+    os.makedirs(os.path.join(folder, "char"), exist_ok=True)
+    with open(os.path.join(folder, "card.webp"), "wb") as f:
+        f.write(data)
+    for a, card in enumerate(cards):
+        cv2.imwrite(os.path.join(folder, f"card{a + 1}.png"), card)
+    for name, regions in (("top", tops), ("bottom", bottoms), ("print", prints)):
+        for a, region in enumerate(regions):
+            cv2.imwrite(os.path.join(folder, "char", f"{name}{a + 1}.png"), region)
+
+
+def read(region, config=NAME_CONFIG, timeout=0):
+    return pytesseract.image_to_string(region, lang="eng", config=config, timeout=timeout).strip().replace("\n", " ")
+
+
+def tile(regions, pad=TILE_PAD):
+    # stack every region on one white page, light-on-dark strips (prints) get
+    # inverted so tesseract sees a single polarity, returns the page and the
+    # (top, bottom) rows each region landed on
+    parts = []
+    for region in regions:
+        if np.median(region) < 128:
+            region = 255 - region
+        if region.shape[0] < 20:
+            region = cv2.resize(region, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+        parts.append(region)
+    width = max(p.shape[1] for p in parts) + 2 * pad
+    height = sum(p.shape[0] for p in parts) + pad * (len(parts) + 1)
+    page = np.full((height, width), 255, np.uint8)
+    rows = []
+    y = pad
+    for p in parts:
+        page[y:y + p.shape[0], pad:pad + p.shape[1]] = p
+        rows.append((y, y + p.shape[0]))
+        y += p.shape[0] + pad
+    return page, rows
+
+
+def read_batch(regions, config=NAME_CONFIG, timeout=0):
+    if not regions:
+        return []
+    page, rows = tile(regions)
+    data = pytesseract.image_to_data(
+        page, lang="eng", config=config, output_type=pytesseract.Output.DICT, timeout=timeout
+    )
+    starts = [top for top, _ in rows]
+    words = [[] for _ in regions]
+    for n, text in enumerate(data["text"]):
+        text = text.strip()
+        if not text:
+            continue
+        center = data["top"][n] + data["height"][n] / 2
+        i = bisect_right(starts, center) - 1
+        # anything tesseract found in the padding between two regions is noise
+        if i < 0 or center >= rows[i][1] + TILE_PAD / 2:
+            continue
+        key = (data["block_num"][n], data["par_num"][n], data["line_num"][n], data["word_num"][n])
+        words[i].append((key, text))
+    return [" ".join(text for _, text in sorted(w)) for w in words]
+
+
+def read_drop(tops, bottoms, prints, batch=True, timeout=0, prep=None):
+    # prep is the preprocess settings (see lib/preprocess), None sends the crops as they are
+    if prep is not None:
+        regions = preprocess(list(tops) + list(bottoms) + list(prints), **prep)
+        a, b = len(tops), len(tops) + len(bottoms)
+        tops, bottoms, prints = regions[:a], regions[a:b], regions[b:]
+    if not batch:
+        return (
+            [read(top, timeout=timeout) for top in tops],
+            [read(bottom, timeout=timeout) for bottom in bottoms],
+            [read(prin, PRINT_CONFIG, timeout) for prin in prints]
+        )
+    texts = read_batch(list(tops) + list(bottoms) + list(prints), timeout=timeout)
+    a, b = len(tops), len(tops) + len(bottoms)
+    # the page is read with the name whitelist, so keep only what the print whitelist would have allowed
+    return texts[:a], texts[a:b], [re.sub(r"[^\d ]", "", text).strip() for text in texts[b:]]
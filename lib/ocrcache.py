@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from lib.imagehash import WORDS, HashMatrix, dct_hash
+from lib.jsonfile import JSONBacked, read_json
+
+
+def phash(region):
+    # 256 bits, name strips are wide so the grid keeps their aspect ratio. different
+    # names are 100+ bits apart on the sample crops
+    return dct_hash(region, (128, 32), (8, 32))
+
+
+class Slots:
+    # the hashes of one kind of crop as columns of a HashMatrix so a near match is one
+    # vectorised scan. an evicted entry's column is reused by the next one put in
+    def __init__(self):
+        self.matrix = HashMatrix()
+        self.keys = []
+        self.free = []
+
+    def add(self, key):
+        if self.free:
+            i = self.free.pop()
+            self.matrix.set(i, key[1])
+            self.keys[i] = key
+        else:
+            i = len(self.keys)
+            self.matrix.append([key[1]])
+            self.keys.append(key)
+        return i
+
+    def remove(self, i):
+        self.keys[i] = None
+        self.free.append(i)
+
+    def nearest(self, h, within):
+        if len(self.keys) == len(self.free):
+            return None
+        distances = self.matrix.distances(h)
+        if self.free:
+            distances[self.free] = WORDS * 64 + 1
+        i = int(distances.argmin())
+        return self.keys[i] if distances[i] <= within else None
+
+
+class OCRCache(JSONBacked):
+    def __init__(self, path="temp/ocr_cache.json", size=5000, distance=8):
+        self.path = path
+        self.size = size
+        self.distance = distance
+        self.entries = OrderedDict()
+        # (kind, hash) -> its column in slots[kind]
+        self.columns = {}
+        self.slots = {}
+        self.hits = 0
+        self.misses = 0
+        self.ocr_time = 0.0
+        self.regions_read = 0
+        self.dirty = 0
+
+    def get(self, kind, h):
+        key = (kind, h)
+        text = self.entries.get(key)
+        if text is None and self.distance and kind in self.slots:
+            near = self.slots[kind].nearest(h, self.distance)
+            if near is not None:
+                key, text = near, self.entries[near]
+        if text is not None:
+            self.entries.move_to_end(key)
+        return text
+
+    def put(self, kind, h, text):
+        # empty reads are never cached so one bad read can't stick
+        if not self.size or not text:
+            return
+        self._add((kind, h), text)
+        self.dirty += 1
+
+    def _add(self, key, text):
+        if key not in self.entries:
+            self.columns[key] = self.slots.setdefault(key[0], Slots()).add(key)
+        self.entries[key] = text
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.size:
+            old, _ = self.entries.popitem(last=False)
+            self.slots[old[0]].remove(self.columns.pop(old))
+
+    async def read_drop(self, pool, img, tops, bottoms, prints, batch=True):
+        if not self.size:
+            return await pool.read_drop(img, tops, bottoms, prints, batch)
+        # hashed on a thread, cv2 never runs on the loop
+        keys = await asyncio.to_thread(
+            lambda: [("top", phash(img[box])) for box in tops] + [("bottom", phash(img[box])) for box in bottoms]
+        )
+        texts = [self.get(*key) for key in keys]
+        missing = [i for i, text in enumerate(texts) if text is None]
+        n = len(tops)
+        need_tops = [tops[i] for i in missing if i < n]
+        need_bottoms = [bottoms[i - n] for i in missing if i >= n]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if not missing and not prints:
+            return texts[:n], texts[n:], []
+        t = time.perf_counter()
+        read_tops, read_bottoms, printlist = await pool.read_drop(img, need_tops, need_bottoms, prints, batch)
+        self.ocr_time += time.perf_counter() - t
+        self.regions_read += len(missing) + len(prints)
+        for i, text in zip(missing, read_tops + read_bottoms):
+            texts[i] = text
+            self.put(*keys[i], text)
+        return texts[:n], texts[n:], printlist
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        per_region = self.ocr_time / self.regions_read if self.regions_read else 0.0
+        return (
+            f"OCR cache {len(self.entries)}/{self.size} entries, {self.hits}/{total} hits ({rate:.0%}), "
+            f"~{self.hits * per_region:.1f}s of tesseract saved"
+        )
+
+    def load(self):
+        if not self.size:
+            return
+        try:
+            rows = [((kind, int(h, 16)), text) for kind, h, text in read_json(self.path) or []]
+        except (ValueError, TypeError):
+            return
+        for key, text in rows:
+            self._add(key, text)
+
+    def rows(self):
+        return [[kind, format(h, "x"), text] for (kind, h), text in self.entries.items()]
@@ -0,0 +1,124 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytesseract
+
+from lib import ocr
+
+
+_barrier = None
+
+
+def _init(tesseract_cmd, barrier=None):
+    global _barrier
+    _barrier = barrier
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+
+def _warm(wait=0):
+    # one tiny read so tesseract's binary and traineddata are paged in before the first drop
+    try:
+        ocr.read(np.full((24, 24), 255, np.uint8))
+    except pytesseract.TesseractNotFoundError as e:
+        # this one can't be unpickled in the parent and would break the whole pool
+        raise RuntimeError(str(e))
+    if _barrier is not None and wait:
+        # the worker is held until every worker has a warm job, so none of them gets two
+        try:
+            _barrier.wait(wait)
+        except threading.BrokenBarrierError:
+            pass
+    return os.getpid()
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # python < 3.13, the attach is registered with the parent's resource
+        # tracker, which forgets it again when the parent unlinks the block
+        return shared_memory.SharedMemory(name=name)
+
+
+def _read(name, shape, tops, bottoms, prints, batch, timeout, prep):
+    shm = _attach(name)
+    try:
+        img = np.ndarray(shape, np.uint8, buffer=shm.buf)
+        result = ocr.read_drop(
+            [img[box] for box in tops], [img[box] for box in bottoms], [img[box] for box in prints],
+            batch, timeout, prep
+        )
+        del img
+        return result
+    except pytesseract.TesseractNotFoundError as e:
+        raise RuntimeError(str(e))
+    finally:
+        shm.close()
+
+
+class OCRPool:
+    def __init__(self, workers=2, timeout=10, recycle_after=200, tesseract_cmd="", prep=None):
+        self.workers = workers
+        self.timeout = timeout
+        self.recycle_after = recycle_after
+        self.tesseract_cmd = tesseract_cmd
+        self.prep = prep
+        self.executor = None
+        _init(tesseract_cmd)
+
+    def start(self):
+        if self.workers > 0 and self.executor is None:
+            # max_tasks_per_child needs spawn, which is what windows does anyway. the barrier
+            # comes from the same context so the workers can be handed it
+            context = multiprocessing.get_context("spawn" if self.recycle_after else None)
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init,
+                initargs=(self.tesseract_cmd, context.Barrier(self.workers)),
+                max_tasks_per_child=self.recycle_after or None
+            )
+
+    async def warm(self, wait=30):
+        # returns the pid of every worker that warmed up
+        if self.executor is None:
+            return [await asyncio.to_thread(_warm)]
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(loop.run_in_executor(self.executor, _warm, wait) for _ in range(self.workers)))
+
+    async def read_drop(self, img, tops, bottoms, prints, batch=True):
+        # tops/bottoms/prints are boxes on img (see layouts.Layout), not arrays
+        if self.executor is None:
+            return await asyncio.wait_for(asyncio.to_thread(
+                ocr.read_drop,
+                [img[box] for box in tops], [img[box] for box in bottoms], [img[box] for box in prints],
+                batch, self.timeout, self.prep
+            ), self.timeout + 1)
+        shm = shared_memory.SharedMemory(create=True, size=img.nbytes)
+        try:
+            await asyncio.to_thread(np.copyto, np.ndarray(img.shape, np.uint8, buffer=shm.buf), img)
+            loop = asyncio.get_running_loop()
+            return await asyncio.wait_for(loop.run_in_executor(
+                self.executor, _read, shm.name, img.shape, tops, bottoms, prints, batch, self.timeout, self.prep
+            ), self.timeout + 1)
+        except BrokenProcessPool:
+            # a worker died mid task, throw the pool away so the next drop gets a fresh one
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.start()
+            raise
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
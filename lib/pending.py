@@ -0,0 +1,56 @@
+import asyncio
+
+
+class Expected:
+    # what karuta has sent for one drop so far. value is the latest enabled buttons (or
+    # reaction), arrived is set the first time one comes in
+    def __init__(self, kind):
+        self.kind = kind
+        self.value = None
+        self.arrived = asyncio.get_running_loop().create_future()
+
+
+class Pending:
+    # drops waiting on karuta (buttons enabled by an edit, or its reactions showing up),
+    # keyed by message id. a drop is expected from the moment it arrives, so an edit that
+    # comes in while it is still being read is kept for when it's grabbed. the raw gateway
+    # events are looked up here directly instead of every wait_for check running against
+    # every edit and reaction. a grab that isn't answered within `timeout` seconds of
+    # starting to wait is given up on
+    def __init__(self, timeout=30.0):
+        self.timeout = timeout
+        self.waiting = {}
+
+    def __len__(self):
+        return len(self.waiting)
+
+    def expect(self, message_id, kind):
+        if message_id not in self.waiting:
+            self.waiting[message_id] = Expected(kind)
+
+    def cancel(self, message_id):
+        # the drop is done with (grabbed, not grabbed or failed), later events are ignored
+        entry = self.waiting.pop(message_id, None)
+        if entry is not None and not entry.arrived.done():
+            entry.arrived.cancel()
+
+    def wants(self, message_id, kind):
+        entry = self.waiting.get(message_id)
+        return entry is not None and entry.kind == kind
+
+    def resolve(self, message_id, kind, value):
+        if not self.wants(message_id, kind):
+            return False
+        entry = self.waiting[message_id]
+        entry.value = value
+        if not entry.arrived.done():
+            entry.arrived.set_result(None)
+        return True
+
+    async def wait(self, message_id, kind, timeout=None):
+        # the latest value, right away when it already came in. raises
+        # asyncio.TimeoutError when nothing came in time
+        self.expect(message_id, kind)
+        entry = self.waiting[message_id]
+        await asyncio.wait_for(asyncio.shield(entry.arrived), self.timeout if timeout is None else timeout)
+        return entry.value
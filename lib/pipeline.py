@@ -0,0 +1,289 @@
+import asyncio
+import os
+import re
+import time
+
+from lib.artindex import confirmed, fingerprint
+from lib.decide import Card, choose
+from lib.layouts import Layouts, image_size
+from lib.ocr import decode, save_drop
+
+BAD_PRINT = 9999999
+
+
+def parse_print(text):
+    try:
+        return int(re.sub(r" \d$| ", "", text))
+    except ValueError:
+        return BAD_PRINT
+
+
+class Drop:
+    # everything about one drop lives here (never on the client) so drops can be handled at the same time
+    def __init__(self, data=None, message=None):
+        self.data = data
+        self.message = message
+        self.start = time.perf_counter()
+        self.buttons = None
+        self.url = None
+        # where lib.archive put the image, relative to the archive folder
+        self.image = None
+        self.img = None
+        self.cardnum = 0
+        self.watermelon_pos = None
+        self.layout = None
+        # boxes on img, see layouts.Layout
+        self.tops = []
+        self.bottoms = []
+        self.prints = []
+        # one entry per card, None where the field was never read
+        self.charlist = []
+        self.anilist = []
+        self.printlist = []
+        self.print_text = []
+        self.print_confidence = []
+        # (field, card) -> (keyword hit, blacklist hit), and lib.decide's ranking of the cards
+        self.matched = {}
+        self.ranking = []
+        # art fingerprint of each card and the cards the art index named, see lib.artindex
+        self.art = None
+        self.recognized = []
+        self.grab = None
+        self.reason = None
+        self.skipped = {}
+        self.read_start = 0.0
+        self.timings = {}
+
+    def stage(self, name, start):
+        now = time.perf_counter()
+        self.timings[name] = self.timings.get(name, 0.0) + now - start
+        return now
+
+
+class Pipeline:
+    # everything on_message does to a drop between the download and the grab decision
+    def __init__(self, pool, cache, digits=None, batch=True, check_print=True, min_confidence=0.5, save_folder=None,
+                 layouts=None, art=None):
+        self.pool = pool
+        self.cache = cache
+        self.digits = digits
+        self.batch = batch
+        self.check_print = check_print
+        self.min_confidence = min_confidence
+        self.save_folder = save_folder
+        self.layouts = layouts or Layouts()
+        self.art = art
+        self.matcher = None
+
+    async def prepare(self, data, drop=None):
+        # the layout only needs the size from the file header, the image itself is
+        # decoded by load() the first time a region is actually read
+        if drop is None:
+            drop = Drop(data)
+        drop.data = data
+        t = drop.read_start = time.perf_counter()
+        size = image_size(data)
+        if size is None:
+            await self.load(drop)
+            size = drop.img.shape[1], drop.img.shape[0]
+            t = time.perf_counter()
+        layout = drop.layout = self.layouts.classify(*size)
+        n = drop.cardnum = layout.count(size[0])
+        drop.watermelon_pos = layout.watermelon if layout.watermelon is not None and layout.watermelon < n else None
+        drop.tops = layout.boxes["top"][:n]
+        drop.bottoms = layout.boxes["bottom"][:n]
+        drop.prints = layout.boxes["print"][:n] if self.check_print else []
+        drop.charlist = [None] * n
+        drop.anilist = [None] * n
+        drop.print_text = [None] * len(drop.prints)
+        drop.print_confidence = [[] for _ in drop.prints]
+        drop.printlist = [None] * len(drop.prints)
+        drop.stage("layout", t)
+        return drop
+
+    async def load(self, drop):
+        # every cv2 call of a drop runs on a thread, the loop only awaits them
+        if drop.img is not None:
+            return drop.img
+        t = time.perf_counter()
+        img = drop.img = await asyncio.to_thread(decode, drop.data)
+        t = drop.stage("decode", t)
+        if self.save_folder and drop.layout is not None:
+            folder = self.save_folder
+            if drop.message is not None:
+                folder = os.path.join(folder, str(drop.message.id))
+            await asyncio.to_thread(
+                save_drop,
+                folder, drop.data, [img[box] for box in drop.layout.card_boxes[:drop.cardnum]],
+                [img[box] for box in drop.tops], [img[box] for box in drop.bottoms],
+                [img[box] for box in drop.prints]
+            )
+            drop.stage("crop", t)
+        return img
+
+    async def read_digits(self, drop, cards):
+        # prints the digit reader is sure about are done, returns the cards that still need tesseract
+        cards = list(cards)
+        if self.digits is None or not cards:
+            return cards
+        img = await self.load(drop)
+        t = time.perf_counter()
+        reads = await asyncio.to_thread(lambda: [self.digits.read(img[drop.prints[i]]) for i in cards])
+        unsure = []
+        for i, (text, confidence) in zip(cards, reads):
+            drop.print_confidence[i] = confidence
+            if text and min(confidence) >= self.min_confidence:
+                drop.print_text[i] = text
+                drop.printlist[i] = parse_print(text)
+            else:
+                unsure.append(i)
+        drop.stage("digits", t)
+        return unsure
+
+    async def recognize(self, drop):
+        # cards whose artwork the index knows get their name and anime from it and skip tesseract
+        boxes = drop.layout.boxes.get("art")
+        if not boxes:
+            return
+        img = await self.load(drop)
+        t = time.perf_counter()
+        drop.art = await asyncio.to_thread(lambda: [fingerprint(img[box]) for box in boxes[:drop.cardnum]])
+        for i, h in enumerate(drop.art):
+            found = self.art.lookup(h)
+            if found is not None:
+                drop.charlist[i], drop.anilist[i] = found
+                drop.recognized.append(i)
+        drop.stage("art", t)
+
+    def confirm(self, drop, character):
+        # karuta said which card we got, a grabbed card it confirms goes in the art index
+        if self.art is None or drop.art is None or drop.grab is None or drop.grab in drop.recognized:
+            return False
+        read = drop.charlist[drop.grab]
+        if not confirmed(read, character):
+            return False
+        return self.art.add(drop.art[drop.grab], character, drop.anilist[drop.grab])
+
+    async def ocr(self, drop, tops=(), bottoms=(), prints=()):
+        # card numbers of the fields to read, all of them go to tesseract in one go
+        tops, bottoms, prints = list(tops), list(bottoms), list(prints)
+        if not tops and not bottoms and not prints:
+            return
+        img = await self.load(drop)
+        # timed per field (ocr_top, ocr_bottom, ocr_print), a read of several fields at
+        # once (Pipeline.read) can't be split and is timed as ocr
+        fields = [name for name, cards in (("top", tops), ("bottom", bottoms), ("print", prints)) if cards]
+        stage = f"ocr_{fields[0]}" if len(fields) == 1 else "ocr"
+        t = time.perf_counter()
+        chars, animes, texts = await self.cache.read_drop(
+            self.pool, img, [drop.tops[i] for i in tops], [drop.bottoms[i] for i in bottoms],
+            [drop.prints[i] for i in prints], self.batch
+        )
+        for i, text in zip(tops, chars):
+            drop.charlist[i] = text
+        for i, text in zip(bottoms, animes):
+            drop.anilist[i] = text
+        t = drop.stage(stage, t)
+        if not prints:
+            return
+        for i, text in zip(prints, texts):
+            drop.print_text[i] = text
+            drop.printlist[i] = parse_print(text)
+        if self.digits is not None:
+            await asyncio.to_thread(lambda: [
+                self.digits.learn(img[drop.prints[i]], re.sub(r" \d$| ", "", text)) for i, text in zip(prints, texts)
+            ])
+        drop.stage("prints", t)
+
+    async def read(self, data, drop=None):
+        # reads every field of every card, for tools.replay_bench --read-all
+        drop = await self.prepare(data, drop)
+        cards = range(drop.cardnum)
+        unsure = await self.read_digits(drop, range(len(drop.prints)))
+        await self.ocr(drop, cards, cards, unsure)
+        drop.printlist = [BAD_PRINT if p is None else p for p in drop.printlist]
+        drop.print_text = ["" if p is None else p for p in drop.print_text]
+        drop.timings["total"] = time.perf_counter() - drop.read_start
+        return drop
+
+    def cards(self, drop, accuracy, blaccuracy):
+        # the decision engine's view of every card. each read field is matched against the
+        # keyword lists once, fields that weren't read stay None
+        matcher = self.matcher
+        for field, texts, lists in (
+                ("character", drop.charlist, ((matcher.chars, accuracy), (matcher.charblacklist, accuracy))),
+                ("anime", drop.anilist, ((matcher.animes, accuracy), (matcher.aniblacklist, blaccuracy)))
+        ):
+            new = [i for i, text in enumerate(texts) if text is not None and (field, i) not in drop.matched]
+            if not new:
+                continue
+            found = [index.best([texts[i] for i in new], threshold) for index, threshold in lists]
+            for n, i in enumerate(new):
+                drop.matched[(field, i)] = (found[0][n].word is not None, found[1][n].word is not None)
+        cards = []
+        for i in range(drop.cardnum):
+            character, charblacklisted = drop.matched.get(("character", i), (None, None))
+            anime, aniblacklisted = drop.matched.get(("anime", i), (None, None))
+            name, series = drop.charlist[i], drop.anilist[i]
+            # the exact check prints have always used, unknown until both texts are read unless one is listed
+            listed = matcher.blacklisted(name, series) or (None if name is None or series is None else False)
+            prin = drop.printlist[i] if i < len(drop.printlist) else None
+            cards.append(Card(character, anime, charblacklisted, aniblacklisted, listed, prin))
+        return cards
+
+    async def decide(self, data, drop, accuracy, blaccuracy, prioritize_watermelon=True, print_number=None):
+        # lib.decide picks the card from what has been read so far and says which cards
+        # could still change the pick. only those get their next field read, in the order
+        # that settles a drop the soonest: names, the anime of name hits (the aniblacklist
+        # can veto them), every other anime, prints the digit reader knows, tesseract prints
+        drop = await self.prepare(data, drop)
+        if not self.check_print:
+            print_number = None
+        if drop.watermelon_pos is not None and prioritize_watermelon:
+            # nothing has to be read, the image isn't even decoded unless it's being saved
+            if self.save_folder:
+                await self.load(drop)
+            return self.verdict(drop, choose([], watermelon=drop.watermelon_pos))
+        if self.art is not None:
+            # cards the art index knows already have their name and anime
+            await self.recognize(drop)
+
+        def judge():
+            return self.judge(drop, accuracy, blaccuracy, print_number)
+
+        decision = judge()
+        if not decision.final:
+            await self.ocr(drop, tops=[i for i in decision.contenders if drop.charlist[i] is None])
+            decision = judge()
+        if not decision.final:
+            hits = [i for i in decision.contenders if drop.matched.get(("character", i), (False,))[0]]
+            await self.ocr(drop, bottoms=[i for i in hits if drop.anilist[i] is None])
+            decision = judge()
+        if not decision.final:
+            await self.ocr(drop, bottoms=[i for i in decision.contenders if drop.anilist[i] is None])
+            decision = judge()
+        if not decision.final:
+            await self.read_digits(drop, [i for i in decision.contenders if drop.printlist[i] is None])
+            decision = judge()
+        if not decision.final:
+            await self.ocr(drop, prints=[i for i in decision.contenders if drop.printlist[i] is None])
+            decision = judge()
+        return self.verdict(drop, decision)
+
+    def judge(self, drop, accuracy, blaccuracy, print_number=None):
+        t = time.perf_counter()
+        decision = choose(self.cards(drop, accuracy, blaccuracy), print_number)
+        drop.stage("match", t)
+        return decision
+
+    def verdict(self, drop, decision):
+        drop.grab = decision.grab
+        drop.reason = decision.reason
+        drop.ranking = decision.ranking
+        fields = (("character", drop.charlist), ("anime", drop.anilist), ("print", drop.print_text))
+        drop.skipped = {
+            name: [i for i, value in enumerate(values) if value is None]
+            for name, values in fields if None in values
+        }
+        drop.timings["total"] = time.perf_counter() - drop.read_start
+        return drop
@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+
+# padding between regions on the shared canvas, wider than half the threshold block
+# so one region's neighbourhood never reaches into the next
+GAP = 16
+
+
+def dark_text(region):
+    # text is the smaller of the two otsu classes, flip the region if that's the bright one
+    if not region.size:
+        return region
+    _, split = cv2.threshold(region, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return 255 - region if np.count_nonzero(split) < split.size / 2 else region
+
+
+def pack(regions, gap=GAP):
+    # every region on one white canvas, returns the canvas and each region's box on it
+    width = max(r.shape[1] for r in regions) + 2 * gap
+    height = sum(r.shape[0] for r in regions) + gap * (len(regions) + 1)
+    canvas = np.full((height, width), 255, np.uint8)
+    boxes = []
+    y = gap
+    for r in regions:
+        canvas[y:y + r.shape[0], gap:gap + r.shape[1]] = r
+        boxes.append((slice(y, y + r.shape[0]), slice(gap, gap + r.shape[1])))
+        y += r.shape[0] + gap
+    return canvas, boxes
+
+
+def clean(binary):
+    # ink mask without specks and without the edge-touching shapes that span the
+    # region or are thin lines (card frame, the icon next to the print)
+    n, labels, stats, _ = cv2.connectedComponentsWithStats((binary < 128).astype(np.uint8), connectivity=8)
+    h, w = binary.shape
+    x, y, bw, bh, area = stats.T
+    edge = (x == 0) | (y == 0) | (x + bw == w) | (y + bh == h)
+    frame = edge & ((bh >= 0.9 * h) | (bw >= 0.5 * w) | (np.minimum(bw, bh) <= 2))
+    keep = ~frame & (area >= 3)
+    keep[0] = False
+    return keep[labels]
+
+
+def trim(binary, margin):
+    # the tight box around the text as black on white, None if there is none
+    ink = clean(binary)
+    rows = np.flatnonzero(ink.any(1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(ink.any(0))
+    y0, y1 = max(rows[0] - margin, 0), rows[-1] + margin + 1
+    x0, x1 = max(cols[0] - margin, 0), cols[-1] + margin + 1
+    return np.where(ink[y0:y1, x0:x1], 0, 255).astype(np.uint8)
+
+
+def rescale(region, height):
+    if region.shape[0] == height:
+        return region
+    scale = height / region.shape[0]
+    width = max(1, round(region.shape[1] * scale))
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+    return cv2.resize(region, (width, height), interpolation=interpolation)
+
+
+def preprocess(regions, block=15, c=10, height=32, margin=4):
+    # adaptive threshold -> trim to the text -> fixed height, for all regions of a drop
+    # at once: they are thresholded as one canvas so it's one opencv call per drop.
+    # a region without any ink comes back as a blank strip so the order is kept
+    regions = list(regions)
+    if not regions:
+        return []
+    canvas, boxes = pack([dark_text(r) for r in regions])
+    binary = cv2.adaptiveThreshold(canvas, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block | 1, c)
+    out = []
+    for box in boxes:
+        text = trim(binary[box], margin)
+        out.append(np.full((height, height), 255, np.uint8) if text is None else rescale(text, height))
+    return out
@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from lib.layouts import extension
+
+
+def where(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def running_stack(frame, top):
+    # the loop thread's stack from the drop's own coroutine down, the event loop above it left out
+    stack = []
+    while frame is not None:
+        stack.append(where(frame))
+        if frame is top:
+            break
+        frame = frame.f_back
+    return stack[::-1]
+
+
+def awaiting_stack(coro):
+    # what a suspended drop is waiting on: its chain of awaits, down to the future at the end
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            stack.append(f"[waiting on {type(coro).__name__}]")
+            break
+        stack.append(where(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class Profiler:
+    # samples where every drop being read is, every `interval` seconds, from a thread: the
+    # loop thread's stack while the drop is running on it, its chain of awaits while it
+    # waits (on the download, an ocr worker, ...). the thread sleeps while no drop is being
+    # read. a drop slower than `threshold` seconds gets its samples written to `root`
+    # (profile.json and profile.folded for flamegraph tools) with the drop image and the
+    # crops ocr read, the `keep` newest are kept. main passes root "" when it's disabled
+    def __init__(self, root="logs/slow", threshold=1.5, interval=0.005, keep=50):
+        self.root = root
+        self.threshold = threshold
+        self.interval = interval
+        self.keep = keep
+        # task -> samples of the drop it is reading
+        self.tracked = {}
+        self.loop = None
+        self.loop_thread = None
+        self.wake = threading.Event()
+        self.stopping = False
+        self.thread = None
+        self.writes = set()
+        self.captured = 0
+
+    def start(self):
+        if not self.root or self.thread is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.thread.start()
+
+    @contextmanager
+    def watch(self, drop):
+        # around the part of a drop that counts as its processing time
+        task = asyncio.current_task() if self.thread is not None else None
+        if task is None:
+            yield
+            return
+        samples = self.tracked[task] = Counter()
+        self.wake.set()
+        try:
+            yield
+        finally:
+            self.tracked.pop(task, None)
+            elapsed = time.perf_counter() - drop.start
+            if elapsed >= self.threshold:
+                self.capture(drop, samples, elapsed)
+
+    def _run(self):
+        while not self.stopping:
+            if not self.tracked:
+                self.wake.clear()
+                self.wake.wait(1)
+                continue
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.loop_thread)
+            current = asyncio.current_task(self.loop)
+            for task, samples in list(self.tracked.items()):
+                coro = task.get_coro()
+                if task is current and frame is not None:
+                    stack = running_stack(frame, coro.cr_frame)
+                else:
+                    stack = awaiting_stack(coro)
+                samples[";".join(stack)] += 1
+
+    def capture(self, drop, samples, elapsed):
+        # everything is copied off the drop here, main drops the image right after
+        record = {
+            "time": datetime.now().isoformat(timespec="seconds"), "drop": drop.message.id,
+            "channel": drop.message.channel.id, "elapsed": round(elapsed, 4), "threshold": self.threshold,
+            "interval": self.interval, "samples": sum(samples.values()),
+            "layout": drop.layout.name if drop.layout else None, "cards": drop.cardnum,
+            "timings": {stage: round(seconds, 4) for stage, seconds in drop.timings.items()},
+            "characters": drop.charlist, "animes": drop.anilist, "prints": drop.print_text,
+            "grab": drop.grab, "reason": drop.reason, "skipped": drop.skipped,
+            "stacks": samples.most_common()
+        }
+        boxes = [
+            (f"{kind}{i + 1}", box) for kind, regions in (("top", drop.tops), ("bottom", drop.bottoms), ("print", drop.prints))
+            for i, box in enumerate(regions)
+        ]
+        data = bytes(drop.data) if drop.data is not None else None
+        task = asyncio.get_running_loop().create_task(
+            asyncio.to_thread(self._write, record, data, drop.img, boxes)
+        )
+        self.writes.add(task)
+        task.add_done_callback(self.writes.discard)
+        self.captured += 1
+
+    def _write(self, record, data, img, boxes):
+        folder = os.path.join(self.root, f"{datetime.now():%Y%m%d-%H%M%S}-{record['drop']}")
+        os.makedirs(folder, exist_ok=True)
+        if data is not None:
+            with open(os.path.join(folder, f"drop.{extension(data)}"), "wb") as f:
+                f.write(data)
+        if img is not None and boxes:
+            import cv2
+            for name, box in boxes:
+                region = img[box]
+                if region.size:
+                    cv2.imwrite(os.path.join(folder, f"{name}.png"), region)
+        with open(os.path.join(folder, "profile.folded"), "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in record["stacks"])
+        with open(os.path.join(folder, "profile.json"), "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=1)
+        self._prune()
+
+    def _prune(self):
+        # folders are named by time so the oldest sort first
+        folders = sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+        for name in folders[:max(0, len(folders) - self.keep)]:
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    async def close(self):
+        self.stopping = True
+        self.wake.set()
+        if self.writes:
+            await asyncio.gather(*self.writes, return_exceptions=True)
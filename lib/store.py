@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import time
+
+from lib.writer import Writer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY, started REAL, ended REAL, collected INTEGER DEFAULT 0, missed INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS drops (
+    id INTEGER PRIMARY KEY, session INTEGER, time REAL, channel INTEGER, layout TEXT, cards INTEGER,
+    url TEXT, read_ms REAL, grab INTEGER, reason TEXT, skipped TEXT, error TEXT
+);
+CREATE TABLE IF NOT EXISTS cards (
+    drop_id INTEGER, card INTEGER, character TEXT, anime TEXT, print INTEGER, print_text TEXT,
+    PRIMARY KEY (drop_id, card)
+);
+CREATE TABLE IF NOT EXISTS grabs (
+    drop_id INTEGER PRIMARY KEY, time REAL, channel INTEGER, card INTEGER, reason TEXT,
+    outcome TEXT, latency_ms REAL, collected TEXT, code TEXT
+);
+CREATE INDEX IF NOT EXISTS drops_time ON drops (time);
+CREATE INDEX IF NOT EXISTS drops_channel ON drops (channel, time);
+CREATE INDEX IF NOT EXISTS cards_character ON cards (character);
+CREATE INDEX IF NOT EXISTS cards_anime ON cards (anime);
+CREATE INDEX IF NOT EXISTS grabs_time ON grabs (time);
+CREATE INDEX IF NOT EXISTS grabs_channel ON grabs (channel, time);
+"""
+
+
+def connect(path, **kwargs):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    db = sqlite3.connect(path, **kwargs)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.executescript(SCHEMA)
+    return db
+
+
+class Store:
+    # everything the bot sees and does, kept in sqlite. the event loop only puts
+    # statements on a queue, whatever has piled up every `interval` seconds is written
+    # on a thread in a single transaction. path "" turns it off. a batch that can't be
+    # written goes to on_error, a database that can't be opened at all stops the store
+    def __init__(self, path="logs/karuta.db", batch=500, interval=1.0, on_error=None):
+        self.path = path
+        # one write at a time, but not always from the same thread
+        self.db = None
+        self.broken = False
+        self.writer = Writer(self._write, batch, interval, errors=(sqlite3.Error, OSError), on_error=on_error)
+        self.session = None
+        self.written = 0
+
+    def start(self):
+        if not self.path or self.session is not None:
+            return
+        self.session = time.time_ns() // 1000
+        self.writer.start()
+        self._put("INSERT INTO sessions (id, started) VALUES (?, ?)", (self.session, time.time()))
+
+    def _put(self, sql, params):
+        if self.session is not None and not self.broken:
+            self.writer.put((sql, params))
+
+    def drop(self, drop, error=None):
+        message = drop.message
+        self._put(
+            "INSERT OR REPLACE INTO drops VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                message.id, self.session, time.time(), message.channel.id,
+                drop.layout.name if drop.layout is not None else None, drop.cardnum,
+                message.attachments[0].url if message.attachments else None,
+                drop.timings.get("total", 0.0) * 1000, drop.grab, drop.reason,
+                json.dumps(drop.skipped) if drop.skipped else None, error
+            )
+        )
+        for i in range(drop.cardnum):
+            character = drop.charlist[i] if i < len(drop.charlist) else None
+            anime = drop.anilist[i] if i < len(drop.anilist) else None
+            prin = drop.printlist[i] if i < len(drop.printlist) else None
+            text = drop.print_text[i] if i < len(drop.print_text) else None
+            if character is None and anime is None and text is None:
+                continue
+            self._put("INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?)", (message.id, i, character, anime, prin, text))
+
+    def grab(self, drop, outcome, latency=None):
+        self._put(
+            "INSERT OR REPLACE INTO grabs (drop_id, time, channel, card, reason, outcome, latency_ms) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                drop.message.id, time.time(), drop.message.channel.id, drop.grab, drop.reason, outcome,
+                None if latency is None else latency * 1000
+            )
+        )
+
+    def collected(self, drop, character, code):
+        # karuta's "took the card" message, the name in it is what the card really was
+        self._put("UPDATE grabs SET collected = ?, code = ? WHERE drop_id = ?", (character, code, drop.message.id))
+
+    def counts(self, collected, missed):
+        self._put("UPDATE sessions SET collected = ?, missed = ? WHERE id = ?", (collected, missed, self.session))
+
+    def _write(self, items):
+        if self.broken:
+            return
+        if self.db is None:
+            try:
+                self.db = connect(self.path, check_same_thread=False)
+            except (sqlite3.Error, OSError):
+                # nothing will be written this session, stop queueing statements
+                self.broken = True
+                raise
+        # runs of the same statement go through executemany, order is kept
+        with self.db:
+            start = 0
+            for end in range(1, len(items) + 1):
+                if end == len(items) or items[end][0] != items[start][0]:
+                    self.db.executemany(items[start][0], [params for _, params in items[start:end]])
+                    start = end
+        self.written += len(items)
+
+    async def close(self):
+        if self.session is None:
+            return
+        self._put("UPDATE sessions SET ended = ? WHERE id = ?", (time.time(), self.session))
+        await self.writer.close()
+        self.session = None
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+# read side, for tools.stats and anything else that wants the history
+
+def totals(db):
+    return db.execute(
+        "SELECT COUNT(*), COALESCE(SUM(collected), 0), COALESCE(SUM(missed), 0) FROM sessions"
+    ).fetchone()
+
+
+def hit_rate_by_anime(db, since=0.0, limit=20):
+    # how often each series was seen and how often a card of it was grabbed
+    return db.execute(
+        """SELECT c.anime, COUNT(*) AS seen, SUM(d.grab = c.card) AS hits
+           FROM drops d JOIN cards c ON c.drop_id = d.id
+           WHERE d.time >= ? AND c.anime IS NOT NULL
+           GROUP BY c.anime ORDER BY hits DESC, seen DESC LIMIT ?""",
+        (since, limit)
+    ).fetchall()
+
+
+def misreads(db, since=0.0):
+    # ocr read of grabbed cards against the name karuta says was collected
+    return db.execute(
+        """SELECT COUNT(*), COALESCE(SUM(lower(c.character) != lower(g.collected)), 0)
+           FROM grabs g JOIN cards c ON c.drop_id = g.drop_id AND c.card = g.card
+           WHERE g.time >= ? AND g.collected IS NOT NULL AND c.character IS NOT NULL""",
+        (since,)
+    ).fetchone()
+
+
+def bad_prints(db, since=0.0):
+    # imported here, lib.pipeline brings cv2 with it and main imports this module at startup
+    from lib.pipeline import BAD_PRINT
+    return db.execute(
+        """SELECT COUNT(*), COALESCE(SUM(c.print = ?), 0)
+           FROM drops d JOIN cards c ON c.drop_id = d.id
+           WHERE d.time >= ? AND c.print_text IS NOT NULL""",
+        (BAD_PRINT, since)
+    ).fetchone()
+
+
+def latency_by_day(db, since=0.0):
+    return db.execute(
+        """SELECT date(time, 'unixepoch', 'localtime') AS day, COUNT(*), AVG(latency_ms), MAX(latency_ms)
+           FROM grabs WHERE time >= ? AND latency_ms IS NOT NULL
+           GROUP BY day ORDER BY day""",
+        (since,)
+    ).fetchall()
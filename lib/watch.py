@@ -0,0 +1,92 @@
+import asyncio
+import os
+
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+
+def stamp(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return None
+
+
+class Watcher:
+    # one task for every watched file. uses the os file events (inotify and friends)
+    # through watchfiles when it's installed and falls back to a stat of each file
+    # every `interval` seconds. changes are collected until nothing has changed for
+    # `debounce` seconds, then callback gets the set of paths (as given) that changed.
+    # an exception from callback goes to on_error and the watching carries on
+    def __init__(self, paths, callback, debounce=0.5, interval=1.0, polling=False, on_error=None):
+        self.paths = {os.path.abspath(p): p for p in paths}
+        self.callback = callback
+        self.on_error = on_error
+        self.debounce = debounce
+        self.interval = interval
+        self.polling = polling or awatch is None
+        self.stamps = {full: stamp(full) for full in self.paths}
+        self.task = None
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def run(self):
+        if not self.polling:
+            try:
+                await self._events()
+            except (OSError, RuntimeError):
+                # no inotify watches left, a network drive, ... polling always works
+                self.polling = True
+        await self._poll()
+
+    def changed(self):
+        # an event only counts if the file really looks different, so saving twice
+        # or touching a neighbour in the same folder doesn't reload anything
+        out = set()
+        for full, path in self.paths.items():
+            new = stamp(full)
+            if new != self.stamps[full]:
+                self.stamps[full] = new
+                out.add(path)
+        return out
+
+    async def notify(self, changed):
+        try:
+            await self.callback(changed)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+
+    async def _events(self):
+        folders = {os.path.dirname(full) for full in self.paths}
+        # step is the quiet time before a batch is yielded, debounce caps how long a batch can grow
+        async for _ in awatch(
+                *folders, step=int(self.debounce * 1000), debounce=int(self.debounce * 4000), recursive=False,
+                watch_filter=lambda change, path: os.path.abspath(path) in self.paths
+        ):
+            changed = self.changed()
+            if changed:
+                await self.notify(changed)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            changed = self.changed()
+            while changed:
+                await asyncio.sleep(self.debounce)
+                more = self.changed()
+                if not more:
+                    break
+                changed |= more
+            if changed:
+                await self.notify(changed)
+
+    def close(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
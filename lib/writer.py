@@ -0,0 +1,70 @@
+import asyncio
+
+
+class Writer:
+    # the loop only puts items on a queue, a background task hands them to write(items)
+    # on a thread, up to `batch` at a time. the first item waits `interval` seconds for
+    # more to join it in the same write. a write that raises one of `errors` counts in
+    # `failed` and goes to on_error, the items after it are still written
+    def __init__(self, write, batch=None, interval=0.0, errors=(OSError,), on_error=None):
+        self.write = write
+        self.batch = batch
+        self.interval = interval
+        self.errors = errors
+        self.on_error = on_error
+        self.queue = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        self.task = None
+        self.failed = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def put(self, item):
+        self.queue.put_nowait(item)
+
+    async def run(self):
+        # None on the queue means close() was called, everything before it is written first
+        while True:
+            first = await self.queue.get()
+            if first is None:
+                return
+            if self.interval and not self.stopping.is_set():
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+            items = [first]
+            stop = False
+            while (self.batch is None or len(items) < self.batch) and not self.queue.empty():
+                item = self.queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
+            await self.flush(items)
+            if stop:
+                return
+
+    async def flush(self, items):
+        try:
+            await asyncio.to_thread(self.write, items)
+        except self.errors as e:
+            self.failed += 1
+            if self.on_error is not None:
+                self.on_error(e)
+
+    async def close(self):
+        if self.task is None:
+            # never started, whatever was put is written here
+            items = []
+            while not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            if items:
+                await self.flush(items)
+            return
+        self.stopping.set()
+        self.queue.put_nowait(None)
+        await self.task
+        self.task = None
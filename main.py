@@ -1,23 +1,55 @@
 import asyncio
+import ctypes
+import importlib.util
 import json
 import os
 import random
 import re
 import sys
+import time
 from datetime import datetime
-from os import listdir, get_terminal_size
-from os.path import isfile, join
+from os import get_terminal_size
 
+STARTED = time.perf_counter()
+
+import aiohttp
 import discord
-import pytesseract
-import requests
 from colorama import Fore, init
-from PIL import Image
 
 from lib import api
-from lib.ocr import *
+from lib.cooldown import Cooldowns
+from lib.download import Downloader
+from lib.eventlog import EventLog
+from lib.ingress import Ingress
+from lib.metrics import Metrics
+from lib.pending import Pending
+from lib.profiler import Profiler
+from lib.store import Store
+from lib.watch import Watcher
 
 init(convert=True)
+# seconds from start to each step, shown once the bot is ready
+startup = {}
+
+
+def mark(step):
+    startup[step] = time.perf_counter() - STARTED
+
+
+mark("imports")
+
+
+def load_ocr():
+    # cv2, numpy and tesseract are the slow imports and nothing needs them before the
+    # first drop, so they're imported on a thread while discord logs in
+    global Archive, ArtIndex, BAD_PRINT, DigitReader, Drop, Matcher, OCRCache, OCRPool, Pipeline
+    from lib.archive import Archive
+    from lib.artindex import ArtIndex
+    from lib.digits import DigitReader
+    from lib.matcher import Matcher
+    from lib.ocrcache import OCRCache
+    from lib.ocrpool import OCRPool
+    from lib.pipeline import BAD_PRINT, Drop, Pipeline
 
 def first_run_setup():
     required_dirs = ["temp", "temp/char", "keywords"]
@@ -44,6 +76,19 @@ def first_run_setup():
             "very_verbose": False,
             "check_print": True,
             "print_number": 1000,
+            "save_temp_images": False,
+            "watch_settings": {
+                "debounce": 0.5,
+                "interval": 1.0,
+                "polling": False
+            },
+            "max_concurrent_drops": 4,
+            "grab_timeout": 30,
+            "download_settings": {
+                "timeout": 10,
+                "pool_size": 8,
+                "cdn_format": ""
+            },
             "event_settings": {
                 "prioritize_watermelon": True
             },
@@ -54,7 +99,67 @@ def first_run_setup():
             "ocr_settings": {
                 "tesseract_path": "",
                 "custom_config": "--psm 6 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz@&0123456789/:- ",
-                "confidence_threshold": 70
+                "confidence_threshold": 70,
+                "batch": True,
+                "workers": 2,
+                "task_timeout": 10,
+                "recycle_after": 200,
+                "cache": {
+                    "size": 5000,
+                    "distance": 8,
+                    "path": "temp/ocr_cache.json"
+                },
+                "digits": {
+                    "enabled": True,
+                    "min_confidence": 0.5
+                },
+                "preprocess": {
+                    "enabled": False,
+                    "block": 15,
+                    "c": 10,
+                    "height": 32
+                },
+                "art_index": {
+                    "enabled": False,
+                    "path": "temp/art_index.json",
+                    "distance": 16,
+                    "margin": 32,
+                    "size": 50000
+                }
+            },
+            "store_settings": {
+                "enabled": True,
+                "path": "logs/karuta.db",
+                "batch": 500,
+                "interval": 1.0
+            },
+            "ingress_settings": {
+                "enabled": True,
+                "lean_cache": True
+            },
+            "archive_settings": {
+                "enabled": True,
+                "path": "archive",
+                "max_mb": 500
+            },
+            "profile_settings": {
+                "enabled": False,
+                "path": "logs/slow",
+                "threshold": 1.5,
+                "interval": 0.005,
+                "keep": 50
+            },
+            "log_settings": {
+                "path": "logs/events.jsonl",
+                "max_bytes": 5242880,
+                "backups": 5,
+                "plain_text": True
+            },
+            "metrics": {
+                "enabled": False,
+                "host": "127.0.0.1",
+                "port": 9464,
+                "window": 500
             },
             "safety": {
                 "max_actions_per_minute": 10,
@@ -83,12 +188,10 @@ def first_run_setup():
                 f.write(content)
 
 def check_requirements():
-    try:
-        import discord
-        import pytesseract
-        import PIL
-    except ImportError as e:
-        print(f"{Fore.RED}Missing required packages: {e}{Fore.RESET}")
+    # only looks for the packages, importing them here would cost as much as the real import
+    missing = [name for name in ("discord", "pytesseract", "PIL") if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"{Fore.RED}Missing required packages: {', '.join(missing)}{Fore.RESET}")
         print(f"{Fore.CYAN}Please install requirements with: pip install -r requirements.txt{Fore.RESET}")
         input("Press Enter to exit...")
         sys.exit(1)
@@ -114,32 +217,78 @@ if os.name == 'nt':
     title = True
 else:
     title = False
-
-token = config["token"]
-channels = config["channels"]
-guilds = config["servers"]
-accuracy = float(config["accuracy"])
-blaccuracy = float(config["blaccuracy"])
-loghits = config["log_hits"]
-logcollection = config["log_collection"]
-timestamp = config["timestamp"]
-update = config["update_check"]
-autodrop = config["autodrop"]
-debug = config["debug"]
-cprint = config["check_print"]
-verbose = config["very_verbose"]
-prioritize_watermelon = config.get("event_settings", {}).get("prioritize_watermelon", True)
-if cprint:
-    pn = int(config["print_number"])
-if autodrop:
-    autodropchannel = config["autodropchannel"]
-    dropdelay = config["dropdelay"]
-    randmin = int(config["randmin"])
-    randmax = int(config["randmax"])
+# the window title shows the cooldown, rewriting it more often than this is pointless
+STATUS_INTERVAL = 5
+
+KEYWORD_FILES = {
+    "keywords\\characters.txt": "chars",
+    "keywords\\animes.txt": "animes",
+    "keywords\\charblacklist.txt": "charblacklist",
+    "keywords\\aniblacklist.txt": "aniblacklist",
+}
+
+
+def read_settings(config):
+    # every setting is parsed before any of them is used, so a reload of config.json
+    # is applied as a whole (one globals update, no await in between) or not at all
+    s = {
+        "token": config["token"],
+        "channels": frozenset(config["channels"]),
+        "guilds": config["servers"],
+        "accuracy": float(config["accuracy"]),
+        "blaccuracy": float(config["blaccuracy"]),
+        "loghits": config["log_hits"],
+        "logcollection": config["log_collection"],
+        "timestamp": config["timestamp"],
+        "update": config["update_check"],
+        "autodrop": config["autodrop"],
+        "debug": config["debug"],
+        "cprint": config["check_print"],
+        "verbose": config["very_verbose"],
+        "prioritize_watermelon": config.get("event_settings", {}).get("prioritize_watermelon", True),
+        "save_temp": config.get("save_temp_images", False),
+        "max_drops": int(config.get("max_concurrent_drops", 4)),
+        "grab_timeout": float(config.get("grab_timeout", 30)),
+        "download_settings": config.get("download_settings", {}),
+        "ocr_settings": config.get("ocr_settings", {}),
+        "metrics_settings": config.get("metrics", {}),
+        "log_settings": config.get("log_settings", {}),
+        "store_settings": config.get("store_settings", {}),
+        "ingress_settings": config.get("ingress_settings", {}),
+        "archive_settings": config.get("archive_settings", {}),
+        "profile_settings": config.get("profile_settings", {}),
+        "watch_settings": config.get("watch_settings", {}),
+    }
+    s["batch_ocr"] = s["ocr_settings"].get("batch", True)
+    s["cache_settings"] = s["ocr_settings"].get("cache", {})
+    s["digit_settings"] = s["ocr_settings"].get("digits", {})
+    s["preprocess_settings"] = s["ocr_settings"].get("preprocess", {})
+    s["art_settings"] = s["ocr_settings"].get("art_index", {})
+    if s["cprint"]:
+        s["pn"] = int(config["print_number"])
+    if s["autodrop"]:
+        s["autodropchannel"] = config["autodropchannel"]
+        s["dropdelay"] = config["dropdelay"]
+        s["randmin"] = int(config["randmin"])
+        s["randmax"] = int(config["randmax"])
+    return s
+
+
+globals().update(read_settings(config))
+mark("config")
 
 class Main(discord.Client):
     def __init__(self, **kwargs):
+        if ingress_settings.get("lean_cache", True):
+            # nothing reads cached messages or members, drops come in through on_message
+            # and the raw edit/reaction events
+            kwargs.setdefault("max_messages", None)
+            kwargs.setdefault("member_cache_flags", discord.MemberCacheFlags.none())
+            kwargs.setdefault("chunk_guilds_at_startup", False)
         super().__init__(**kwargs)
+        self.ingress = Ingress(channels)
+        if ingress_settings.get("enabled", True):
+            self.ingress.install(self._connection.parsers)
         self.charblacklist = None
         self.aniblacklist = None
         self.animes = None
@@ -147,20 +296,160 @@ class Main(discord.Client):
         self.messageid = None
         self.current_card = None
         self.ready = False
-        self.timer = 0
-        self.url = None
+        self.cooldowns = Cooldowns()
         self.missed = 0
         self.collected = 0
-        self.cardnum = 0
-        self.buttons = None
-        self.watermelon_pos = None
+        # the last drop grabbed in each channel, for karuta's "took the card" reply
+        self.last_hit = {}
+        self.watcher = None
+        self.drop_tasks = set()
+        # flushes and the ocr warm up, kept until they're done so a failure gets reported
+        self.background = set()
+        self.warming = None
+        self.drop_slots = asyncio.Semaphore(max_drops)
+        self.pending = Pending(timeout=grab_timeout)
+        self.downloader = Downloader(
+            timeout=float(download_settings.get("timeout", 10)),
+            pool_size=int(download_settings.get("pool_size", 8))
+        )
+        # built by setup_ocr once load_ocr is done
+        self.ocr_pool = None
+        self.ocr_cache = None
+        self.digits = None
+        self.art_index = None
+        self.pipeline = None
+        self.archive = None
+        self.loading = None
+        self.log = EventLog(
+            path=log_settings.get("path", "logs/events.jsonl"),
+            max_bytes=int(log_settings.get("max_bytes", 5242880)),
+            backups=int(log_settings.get("backups", 5)),
+            text_path="log.txt" if log_settings.get("plain_text", True) else None,
+            timestamp=timestamp, on_error=lambda e: self.write_failed("log", e)
+        )
+        self.metrics = Metrics(window=int(metrics_settings.get("window", 500)))
+        self.store = Store(
+            path=store_settings.get("path", "logs/karuta.db") if store_settings.get("enabled", True) else "",
+            batch=int(store_settings.get("batch", 500)),
+            interval=float(store_settings.get("interval", 1.0)),
+            on_error=lambda e: self.write_failed("store", e)
+        )
+        self.profiler = Profiler(
+            root=profile_settings.get("path", "logs/slow") if profile_settings.get("enabled", False) else "",
+            threshold=float(profile_settings.get("threshold", 1.5)),
+            interval=float(profile_settings.get("interval", 0.005)),
+            keep=int(profile_settings.get("keep", 50))
+        )
+        self.metrics.gauge("collected", lambda: self.collected)
+        self.metrics.gauge("missed", lambda: self.missed)
+        self.metrics.gauge("cooldown_seconds", lambda: self.cooldowns.remaining("grab"))
+        self.metrics.gauge("pending_drops", lambda: len(self.pending))
+        self.metrics.gauge("ingress_dropped", lambda: self.ingress.dropped)
+        self.metrics.gauge("slow_drops_captured", lambda: self.profiler.captured)
+        self.metrics.gauge("startup_seconds", lambda: startup.get("ready", 0.0))
+
+    def setup_ocr(self):
+        self.ocr_pool = OCRPool(
+            workers=int(ocr_settings.get("workers", 2)),
+            timeout=float(ocr_settings.get("task_timeout", 10)),
+            recycle_after=int(ocr_settings.get("recycle_after", 200)),
+            tesseract_cmd=ocr_settings.get("tesseract_path", ""),
+            prep={
+                "block": int(preprocess_settings.get("block", 15)),
+                "c": float(preprocess_settings.get("c", 10)),
+                "height": int(preprocess_settings.get("height", 32))
+            } if preprocess_settings.get("enabled", False) else None
+        )
+        self.ocr_cache = OCRCache(
+            path=cache_settings.get("path", "temp/ocr_cache.json"),
+            size=int(cache_settings.get("size", 5000)),
+            distance=int(cache_settings.get("distance", 8))
+        )
+        self.ocr_cache.load()
+        self.art_index = None
+        if art_settings.get("enabled", False):
+            self.art_index = ArtIndex(
+                path=art_settings.get("path", "temp/art_index.json"),
+                distance=int(art_settings.get("distance", 16)),
+                margin=int(art_settings.get("margin", 32)),
+                size=int(art_settings.get("size", 50000))
+            )
+            self.art_index.load()
+        self.digits = None
+        if digit_settings.get("enabled", True):
+            self.digits = DigitReader(min_confidence=float(digit_settings.get("min_confidence", 0.5)))
+            self.digits.load()
+        self.archive = Archive(
+            root=archive_settings.get("path", "archive") if archive_settings.get("enabled", True) else "",
+            max_bytes=int(float(archive_settings.get("max_mb", 500)) * 1024 * 1024),
+            on_error=lambda e: self.write_failed("archive", e)
+        )
+        self.pipeline = Pipeline(
+            self.ocr_pool, self.ocr_cache, self.digits, batch=batch_ocr, check_print=cprint,
+            min_confidence=float(digit_settings.get("min_confidence", 0.5)),
+            save_folder=path_to_ocr if save_temp else None, art=self.art_index
+        )
+
+    async def load(self):
+        await asyncio.to_thread(load_ocr)
+        self.setup_ocr()
+        # workers spin up and load tesseract while the gateway connects
+        self.ocr_pool.start()
+        self.archive.start()
+        self.warming = self.in_background(self.ocr_pool.warm(), self.ocr_failed)
+        mark("ocr")
+
+    async def setup_hook(self):
+        mark("login")
+        self.loading = asyncio.get_running_loop().create_task(self.load())
+        self.log.start()
+        self.store.start()
+        self.profiler.start()
+        if metrics_settings.get("enabled", False):
+            host = metrics_settings.get("host", "127.0.0.1")
+            port = int(metrics_settings.get("port", 9464))
+            await self.metrics.serve(host, port)
+            tprint(f"{Fore.MAGENTA}Metrics at http://{host}:{port}/metrics{Fore.RESET}")
 
     async def on_ready(self):
+        mark("gateway")
+        # only what has to happen before a drop can be read is awaited here, the version
+        # checks run afterwards. the screen is cleared while the ocr side loads, and before
+        # anything else is printed so the keyword summary stays on it
+        banner = asyncio.get_running_loop().create_task(self.banner())
+        await self.loading
+        await banner
+        await self.update_files()
+        await asyncio.gather(*(self.subscribe(guild) for guild in guilds))
         if title:
-            await asyncio.create_subprocess_shell("cls")
-        else:
-            await asyncio.create_subprocess_shell("clear")
-        await asyncio.sleep(0.5)
+            asyncio.get_event_loop().create_task(self.status())
+        if self.watcher is None:
+            self.watcher = Watcher(
+                list(KEYWORD_FILES) + ["config.json"], self.files_changed,
+                debounce=float(watch_settings.get("debounce", 0.5)),
+                interval=float(watch_settings.get("interval", 1.0)),
+                polling=watch_settings.get("polling", False),
+                on_error=lambda e: tprint(f"{Fore.RED}Reloading the changed files failed: {e!r}{Fore.RESET}")
+            )
+            self.watcher.start()
+            dprint(f"Watching keywords and config.json ({'polling' if self.watcher.polling else 'file events'})")
+        if autodrop:
+            asyncio.get_event_loop().create_task(self.autodrop())
+        self.ready = True
+        mark("ready")
+        asyncio.get_event_loop().create_task(self.startup_checks())
+
+    async def subscribe(self, guild):
+        try:
+            await self.get_guild(guild).subscribe(typing=True, activities=False, threads=False,
+                                                  member_updates=False)
+        except AttributeError:
+            tprint(f"{Fore.RED}Error when subscribing to a server, maybe theres a server you aren't in")
+
+    async def banner(self):
+        # waited for instead of sleeping
+        clear = await asyncio.create_subprocess_shell("cls" if title else "clear")
+        await clear.wait()
         thing = f"""{Fore.LIGHTMAGENTA_EX}
  ____  __.                    __             _________      .__                     
 |    |/ _|____ _______ __ ___/  |______     /   _____/ ____ |__|_____   ___________ 
@@ -176,37 +465,29 @@ class Main(discord.Client):
         tprint(
             f"{Fore.BLUE}Logged in as {Fore.RED}{self.user.name}#{self.user.discriminator} {Fore.GREEN}({self.user.id}){Fore.RESET} "
         )
-        latest_ver = update_check().strip()
+
+    async def startup_checks(self):
+        # the bot is already listening by now
+        tprint(
+            f"{Fore.GREEN}Ready in {startup['ready']:.2f}s {Fore.LIGHTBLACK_EX}("
+            + ", ".join(f"{step} {seconds:.2f}s" for step, seconds in sorted(startup.items(), key=lambda s: s[1])) + f"){Fore.RESET}"
+        )
+        if beta:
+            tprint(f"{Fore.RED}[!] You are on the beta branch, please report all actual issues to the github repo")
+        dprint(f"discord.py-self version {discord.__version__}")
+        if debug:
+            dprint(f"Tesseract version {await asyncio.to_thread(tesseract_version)}")
+        if not update:
+            return
+        try:
+            latest_ver = (await self.update_check()).strip()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            dprint(f"Update check failed: {e!r}")
+            return
         if latest_ver != v:
             tprint(
                 f"{Fore.RED}You are on version {v}, while the latest version is {latest_ver}"
             )
-        dprint(f"discord.py-self version {discord.__version__}")
-        dprint(f"Tesseract version {pytesseract.get_tesseract_version()}")
-        if beta:
-            tprint(f"{Fore.RED}[!] You are on the beta branch, please report all actual issues to the github repo")
-        await self.update_files()
-        for guild in guilds:
-            try:
-                await self.get_guild(guild).subscribe(typing=True, activities=False, threads=False,
-                                                      member_updates=False)
-            except AttributeError:
-                tprint(f"{Fore.RED}Error when subscribing to a server, maybe theres a server you aren't in")
-        asyncio.get_event_loop().create_task(self.cooldown())
-        asyncio.get_event_loop().create_task(self.filewatch("keywords\\animes.txt"))
-        asyncio.get_event_loop().create_task(self.filewatch("keywords\\characters.txt"))
-        asyncio.get_event_loop().create_task(
-            self.filewatch("keywords\\aniblacklist.txt")
-        )
-        asyncio.get_event_loop().create_task(
-            self.configwatch("config.json")
-        )
-        asyncio.get_event_loop().create_task(
-            self.filewatch("keywords\\charblacklist.txt")
-        )
-        if autodrop:
-            asyncio.get_event_loop().create_task(self.autodrop())
-        self.ready = True
 
     async def on_message(self, message):
         cid = message.channel.id
@@ -220,262 +501,28 @@ class Main(discord.Client):
         if message.content.startswith(f"<@{str(self.user.id)}>, your ") and "blessing has activated!" in message.content:
             await asyncio.sleep(random.uniform(0.5, 1.5))
             if "Evasion" in message.content:
-                self.timer = 0
+                self.cooldowns.reset("grab")
                 dprint("Evasion blessing detected - resetting grab cooldown")
             elif "Generosity" in message.content and autodrop:
-                self.timer = 0
                 dprint("Generosity blessing detected - resetting drop cooldown")
                 await self.get_channel(autodropchannel).send("kd")
+                self.cooldowns.set("drop", dropdelay + random.randint(randmin, randmax))
                 tprint(f"{Fore.LIGHTWHITE_EX}Auto Dropped Cards after blessing")
             return
 
-        def mcheck(before, after):
-            if before.id == message.id and not after.components[0].children[0].disabled:
-                dprint("Message edit found")
-                try:
-                    self.buttons = after.components[0].children
-                    return True
-                except IndexError:
-                    dprint(f"Fuck - {after.components}")
-            else:
-                return False
-
-        def check(reaction0, user):
-            return reaction0.message.id == message.id
-
         if re.search("A wishlisted card is dropping!", message.content):
             dprint("Whishlisted card detected")
 
-        if self.timer == 0 and re.search(match, message.content):
-            self.watermelon_pos = None
-            with open("temp\\card.webp", "wb") as file:
-                file.write(requests.get(message.attachments[0].url).content)
-            
-            is_watermelon_event = "special event drop" in message.content.lower()
-            img = Image.open("temp\\card.webp")
-            width, height = img.size
-            
-            if filelength("temp\\card.webp") == 836:
-                self.cardnum = 3
-                for a in range(3):
-                    await get_card(
-                        f"{path_to_ocr}\\card{a + 1}.png", "temp\\card.webp", a
-                    )
-
-                for a in range(3):
-                    await get_top(
-                        f"{path_to_ocr}\\card{a + 1}.png",
-                        f"{path_to_ocr}\\char\\top{a + 1}.png"
-                    )
-                    await get_bottom(
-                        f"{path_to_ocr}\\card{a + 1}.png",
-                        f"{path_to_ocr}\\char\\bottom{a + 1}.png"
-                    )
-                    if cprint:
-                        await get_print(
-                            f"{path_to_ocr}\\card{a + 1}.png",
-                            f"{path_to_ocr}\\char\\print{a + 1}.png"
-                        )
-            else:
-                if width == 836 and height < 400:
-                    self.cardnum = 4
-                else:
-                    self.cardnum = 5
-                    self.watermelon_pos = 4
-                    if height < 500:
-                        self.watermelon_pos = 3
-
-                for a in range(self.cardnum):
-                    await get_card(
-                        f"{path_to_ocr}\\card{a + 1}.png", "temp\\card.webp", a
-                    )
-
-                for a in range(self.cardnum):
-                    await get_top(
-                        f"{path_to_ocr}\\card{a + 1}.png",
-                        f"{path_to_ocr}\\char\\top{a + 1}.png"
-                    )
-                    await get_bottom(
-                        f"{path_to_ocr}\\card{a + 1}.png",
-                        f"{path_to_ocr}\\char\\bottom{a + 1}.png"
-                    )
-                    if cprint:
-                        await get_print(
-                            f"{path_to_ocr}\\card{a + 1}.png",
-                            f"{path_to_ocr}\\char\\print{a + 1}.png"
-                        )
-
-            onlyfiles = [
-                ff for ff in listdir("temp\\char") if isfile(join("temp\\char", ff))
-            ]
-            charlist = []
-            anilist = []
-            printlist = []
-            for img in onlyfiles:
-                if "4" in img and self.cardnum < 4:
-                    continue
-                if "5" in img and self.cardnum < 5:
-                    continue
-                if "top" in img:
-                    custom_config = r"--psm 6 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz@&0123456789/:- "
-                    charlist.append(
-                        pytesseract.image_to_string(
-                            Image.open(
-                                path_to_ocr
-                                + "\\char\\top"
-                                + re.sub(r"\D", "", img)
-                                + ".png"
-                            ),
-                            lang="eng",
-                            config=custom_config
-                        )
-                        .strip()
-                        .replace("\n", " ")
-                    )
-                elif "bottom" in img:
-                    custom_config = r"--psm 6 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz@&0123456789/:- "
-                    anilist.append(
-                        pytesseract.image_to_string(
-                            Image.open(
-                                path_to_ocr
-                                + "\\char\\bottom"
-                                + re.sub(r"\D", "", img)
-                                + ".png"
-                            ),
-                            lang="eng",
-                            config=custom_config
-                        )
-                        .strip()
-                        .replace("\n", " ")
-                    )
-                elif cprint and "print" in img:
-                    custom_config = r"--psm 7 --oem 3 -c tessedit_char_whitelist=0123456789"
-                    printlist.append(
-                        pytesseract.image_to_string(
-                            Image.open(path_to_ocr + f"\\char\\{img}"),
-                            lang="eng",
-                            config=custom_config
-                        ).strip()
-                    )
-            vprint(f"Anilist: {anilist}")
-            vprint(f"Charlist: {charlist}")
-            for i, number in enumerate(printlist):
-                try:
-                    printlist[i] = int(re.sub(" \d$| ", "", number))
-                except ValueError:
-                    dprint(f"{Fore.RED}ValueError - current string: {number}")
-                    printlist[i] = 9999999
-            vprint(f"Printlist: {printlist}")
-
-            def emoji(b):
-                if self.watermelon_pos is not None and b == self.watermelon_pos:
-                    return "🍉"
-                match b:
-                    case 0:
-                        return "1️⃣"
-                    case 1:
-                        return "2️⃣"
-                    case 2:
-                        return "3️⃣"
-                    case 3:
-                        return "4️⃣"
-                    case 4:
-                        return "5️⃣"
-
-            if self.watermelon_pos is not None and prioritize_watermelon:
-                tprint(f"{Fore.GREEN}[{message.channel.name}] Found Watermelon Event - Prioritizing Grab{Fore.RESET}")
-                self.url = message.attachments[0].url
-                if loghits:
-                    with open("log.txt", "a") as ff:
-                        if timestamp:
-                            ff.write(f"{current_time()} - Watermelon Event - {self.url}\n")
-                        else:
-                            ff.write(f"Watermelon Event - {self.url}\n")
-                if isbutton(cid):
-                    await self.wait_for("message_edit", check=mcheck)
-                    await asyncio.sleep(random.uniform(0.55, 1.08))
-                    await self.buttons[self.watermelon_pos].click()
-                    await self.afterclick()
-                else:
-                    reaction = await self.wait_for("reaction_add", check=check)
-                    await self.react_add(reaction, emoji(self.watermelon_pos))
-                return
-            elif self.watermelon_pos is not None:
-                tprint(f"{Fore.YELLOW}[{message.channel.name}] Watermelon Event detected but skipping (disabled in config){Fore.RESET}")
-
-            for i, character in enumerate(charlist):
-                if (
-                        api.isSomething(character, self.chars, accuracy)
-                        and not api.isSomething(character, self.charblacklist, accuracy)
-                        and not api.isSomething(anilist[i], self.aniblacklist, blaccuracy)
-                ):
-                    tprint(
-                        f"{Fore.GREEN}[{message.channel.name}] Found Character: {Fore.MAGENTA}{character} {Fore.LIGHTMAGENTA_EX}from {Fore.LIGHTBLUE_EX}{anilist[i]}{Fore.RESET}"
-                    )
-                    self.url = message.attachments[0].url
-                    if loghits:
-                        with open("log.txt", "a") as ff:
-                            if timestamp:
-                                ff.write(f"{current_time()} - Character: {character} - {self.url}\n")
-                            else:
-                                ff.write(f"Character: {character} - {self.url}\n")
-                    if isbutton(cid):
-                        await self.wait_for("message_edit", check=mcheck)
-                        await asyncio.sleep(random.uniform(0.55, 1.08))
-                        await self.buttons[i].click()
-                        await self.afterclick()
-                    else:
-                        reaction = await self.wait_for("reaction_add", check=check)
-                        await self.react_add(reaction, emoji(i))
-            for i, anime in enumerate(anilist):
-                if (
-                        api.isSomething(anime, self.animes, accuracy)
-                        and not api.isSomething(charlist[i], self.charblacklist, accuracy)
-                        and not api.isSomething(anime, self.aniblacklist, blaccuracy)
-                ):
-                    tprint(
-                        f"{Fore.GREEN}[{message.channel.name}] Found Anime: {Fore.MAGENTA}{anime} {Fore.LIGHTMAGENTA_EX}| {Fore.LIGHTBLUE_EX}{charlist[i]}{Fore.RESET}"
-                    )
-                    self.url = message.attachments[0].url
-                    if loghits:
-                        with open("log.txt", "a") as ff:
-                            if timestamp:
-                                ff.write(f"{current_time()} - Anime: {anime} - {self.url}\n")
-                            else:
-                                ff.write(f"Anime: {anime} - {self.url}\n")
-                    if isbutton(cid):
-                        await self.wait_for("message_edit", check=mcheck)
-                        await asyncio.sleep(random.uniform(0.55, 1.08))
-                        await self.buttons[i].click()
-                        await self.afterclick()
-                    else:
-                        reaction = await self.wait_for("reaction_add", check=check)
-                        await self.react_add(reaction, emoji(i))
-            if cprint:
-                for i, prin in enumerate(printlist):
-                    if (
-                            prin <= pn
-                            and anilist[i] not in self.aniblacklist
-                            and charlist[i] not in self.charblacklist
-                    ):
-                        tprint(
-                            f"{Fore.GREEN}[{message.channel.name}] Found Print # {Fore.MAGENTA}{prin}{Fore.RESET}"
-                        )
-                        self.url = re.sub(r"\?.*", "", message.attachments[0].url)
-                        if loghits:
-                            with open("log.txt", "a") as ff:
-                                if timestamp:
-                                    ff.write(f"{current_time()} - Print Number {prin} - {self.url}\n")
-                                else:
-                                    ff.write(f"Print Number {prin} - {self.url}\n")
-                        if isbutton(cid):
-                            await self.wait_for("message_edit", check=mcheck)
-                            await asyncio.sleep(random.uniform(0.55, 1.08))
-                            await self.buttons[i].click()
-                            await self.afterclick()
-                        else:
-                            reaction = await self.wait_for("reaction_add", check=check)
-                            await self.react_add(reaction, emoji(i))
+        if self.cooldowns.ready("grab") and re.search(match, message.content):
+            # every drop gets its own task and context, so drops in different
+            # channels are read side by side without sharing any state. its clock
+            # starts here, time spent waiting for a free slot counts too
+            drop = Drop(message=message)
+            # karuta may enable the buttons before the drop is read, that edit is kept
+            self.pending.expect(message.id, "edit" if isbutton(cid) else "reaction")
+            task = asyncio.get_running_loop().create_task(self.handle_drop(drop))
+            self.drop_tasks.add(task)
+            task.add_done_callback(self.drop_tasks.discard)
         elif re.search(
                 f"<@{str(self.user.id)}> took the \*\*.*\*\* card `.*`!|<@{str(self.user.id)}> fought off .* and took the \*\*.*\*\* card `.*`!",
                 message.content
@@ -484,96 +531,343 @@ class Main(discord.Client):
                 f"<@{str(self.user.id)}>.*took the \*\*(.*)\*\* card `(.*)`!",
                 message.content
             )
-            self.timer += 540
+            self.cooldowns.add("grab", 540)
             self.missed -= 1
             self.collected += 1
+            self.metrics.inc("collected_total")
+            hit = self.last_hit.get(cid)
+            if hit is not None:
+                self.store.collected(hit, a.group(1), a.group(2))
+                self.archive.collected(hit.message.id, a.group(1), a.group(2))
+                if self.pipeline.confirm(hit, a.group(1)):
+                    dprint(f"Added {a.group(1)} to the art index")
+                    self.in_background(self.art_index.flush(), lambda e: self.write_failed("art index", e))
+            self.store.counts(self.collected, self.missed)
             tprint(
                 f"{Fore.BLUE}[{message.channel.name}] Obtained Card: {Fore.LIGHTMAGENTA_EX}{a.group(1)}{Fore.RESET}"
             )
             if logcollection:
-                with open("log.txt", "a") as ff:
-                    if timestamp:
-                        ff.write(f"{current_time()} - Card: {a.group(1)} - {self.url}\n")
-                    else:
-                        ff.write(f"Card: {a.group(1)} - {self.url}\n")
-
-    async def react_add(self, reaction, emoji):
-        reaction, _ = reaction
+                url = hit.url if hit is not None else None
+                self.log.event(
+                    "collected", text=f"Card: {a.group(1)} - {url}", channel=cid,
+                    character=a.group(1), code=a.group(2), url=url, image=hit.image if hit is not None else None
+                )
+
+    async def handle_drop(self, drop):
+        try:
+            # a slot covers reading the drop, waiting on karuta and clicking happen outside it
+            async with self.drop_slots:
+                drop.stage("queued", drop.start)
+                grab = await self.read_drop(drop)
+            if grab:
+                await self.grab(drop, drop.grab)
+        finally:
+            # grabbed, not grabbed or failed, nothing waits on this drop's edits any more
+            self.pending.cancel(drop.message.id)
+
+    async def process(self, drop):
+        # download and decide, False if the drop got no decision
+        message = drop.message
+        try:
+            with self.metrics.time("download"):
+                data = await self.downloader.fetch_image(
+                    message.attachments[0].url, download_settings.get("cdn_format")
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.metrics.inc("errors_total", stage="download")
+            tprint(f"{Fore.RED}[{message.channel.name}] Failed to download drop: {e!r}{Fore.RESET}")
+            return False
+        try:
+            await self.pipeline.decide(
+                data, drop, accuracy, blaccuracy, prioritize_watermelon, pn if cprint else None
+            )
+        except (asyncio.TimeoutError, RuntimeError) as e:
+            self.metrics.inc("errors_total", stage="ocr")
+            tprint(f"{Fore.RED}[{message.channel.name}] OCR failed: {e!r}{Fore.RESET}")
+            self.store.drop(drop, error=repr(e))
+            return False
+        return True
+
+    async def read_drop(self, drop):
+        message = drop.message
+        cid = message.channel.id
+        self.metrics.inc("drops_total")
+        # a drop slower than profile_settings.threshold is saved with where its time went
+        with self.profiler.watch(drop):
+            decided = await self.process(drop)
+        if not decided:
+            return
+        self.store.drop(drop)
+        if drop.grab is not None:
+            # hashed here, written (with the card crops) in the background
+            drop.image = self.archive.save(drop, grab=drop.grab, reason=drop.reason)
+        # the image isn't needed past the decision, don't keep it around in last_hit
+        drop.img = drop.data = None
+        for stage, seconds in drop.timings.items():
+            self.metrics.observe(stage, seconds)
+        charlist, anilist, printlist = drop.charlist, drop.anilist, drop.printlist
+        dprint(self.ocr_cache.stats())
+        if self.art_index is not None:
+            dprint(self.art_index.stats())
+        if self.ocr_cache.dirty >= 50:
+            self.in_background(self.ocr_cache.flush(), lambda e: self.write_failed("ocr cache", e))
+        vprint(f"Anilist: {anilist}")
+        vprint(f"Charlist: {charlist}")
+        for i, text in enumerate(drop.print_text):
+            if printlist[i] == BAD_PRINT:
+                dprint(f"{Fore.RED}ValueError - current string: {text}")
+            if text is not None:
+                vprint(f"Print {i + 1}: {text!r} {[round(c, 2) for c in drop.print_confidence[i]]}")
+        vprint(f"Printlist: {printlist}")
+        # fields that were never read because the decision was already made without them
+        vprint(f"Decision: card {drop.grab} ({drop.reason}) - ranking {drop.ranking} - skipped {drop.skipped or 'nothing'}")
+        for field, cards in drop.skipped.items():
+            self.metrics.inc("fields_skipped_total", len(cards), field=field)
+        if drop.watermelon_pos is not None and not prioritize_watermelon:
+            tprint(f"{Fore.YELLOW}[{message.channel.name}] Watermelon Event detected but skipping (disabled in config){Fore.RESET}")
+        i = drop.grab
+        if i is None:
+            return False
+        self.metrics.inc("hits_total", kind=drop.reason)
+        drop.url = message.attachments[0].url
+        self.last_hit[cid] = drop
+        if drop.reason == "watermelon":
+            tprint(f"{Fore.GREEN}[{message.channel.name}] Found Watermelon Event - Prioritizing Grab{Fore.RESET}")
+            text = f"Watermelon Event - {drop.url}"
+        elif drop.reason == "character":
+            tprint(
+                f"{Fore.GREEN}[{message.channel.name}] Found Character: {Fore.MAGENTA}{charlist[i]} {Fore.LIGHTMAGENTA_EX}from {Fore.LIGHTBLUE_EX}{anilist[i]}{Fore.RESET}"
+            )
+            text = f"Character: {charlist[i]} - {drop.url}"
+        elif drop.reason == "anime":
+            tprint(
+                f"{Fore.GREEN}[{message.channel.name}] Found Anime: {Fore.MAGENTA}{anilist[i]} {Fore.LIGHTMAGENTA_EX}| {Fore.LIGHTBLUE_EX}{charlist[i]}{Fore.RESET}"
+            )
+            text = f"Anime: {anilist[i]} - {drop.url}"
+        else:
+            tprint(
+                f"{Fore.GREEN}[{message.channel.name}] Found Print # {Fore.MAGENTA}{printlist[i]}{Fore.RESET}"
+            )
+            drop.url = re.sub(r"\?.*", "", message.attachments[0].url)
+            text = f"Print Number {printlist[i]} - {drop.url}"
+        if loghits:
+            self.log.event(
+                "hit", text=text, reason=drop.reason, channel=cid, card=i,
+                character=charlist[i] if charlist else None, anime=anilist[i] if anilist else None,
+                print=printlist[i] if printlist else None, url=drop.url, image=drop.image, ranking=drop.ranking,
+                skipped=drop.skipped
+            )
+        return True
+
+    async def grab(self, drop, i):
+        message = drop.message
+        try:
+            if isbutton(message.channel.id):
+                await self.wait_edit(drop)
+            else:
+                await self.wait_reaction(drop)
+        except asyncio.TimeoutError:
+            tprint(f"{Fore.RED}[{message.channel.name}] Gave up on the drop, karuta never enabled it{Fore.RESET}")
+            self.metrics.inc("errors_total", stage="wait")
+            self.store.grab(drop, "expired")
+            return
+        if drop.buttons is not None:
+            await asyncio.sleep(random.uniform(0.55, 1.08))
+            if not self.still_ready(drop):
+                return
+            await self.click(drop, drop.buttons[i])
+            await self.afterclick()
+            self.store.counts(self.collected, self.missed)
+        else:
+            await self.react_add(drop, emoji(drop, i))
+
+    def still_ready(self, drop):
+        # checked again right before clicking, another drop may have been grabbed while this one waited
+        if self.cooldowns.ready("grab"):
+            return True
+        tprint(f"{Fore.YELLOW}[{drop.message.channel.name}] Skipped the grab, another drop was grabbed first{Fore.RESET}")
+        self.store.grab(drop, "cooldown")
+        return False
+
+    async def wait_edit(self, drop):
+        with self.metrics.time("wait_edit"):
+            drop.buttons = await self.pending.wait(drop.message.id, "edit")
+
+    async def wait_reaction(self, drop):
+        with self.metrics.time("wait_reaction"):
+            await self.pending.wait(drop.message.id, "reaction")
+
+    async def on_raw_message_edit(self, payload):
+        # one dict lookup for every edit discord sends, only a drop we're waiting on goes further
+        if not self.pending.wants(payload.message_id, "edit"):
+            return
+        try:
+            buttons = payload.message.components[0].children
+        except (IndexError, AttributeError):
+            dprint(f"Fuck - {payload.message.components}")
+            return
+        if buttons and not buttons[0].disabled:
+            dprint("Message edit found")
+            self.pending.resolve(payload.message_id, "edit", buttons)
+
+    async def on_raw_reaction_add(self, payload):
+        self.pending.resolve(payload.message_id, "reaction", payload)
+
+    async def click(self, drop, button):
+        with self.metrics.time("click"):
+            await button.click()
+        latency = time.perf_counter() - drop.start
+        self.metrics.observe("end_to_end", latency)
+        self.store.grab(drop, "clicked", latency)
+
+    async def react_add(self, drop, emoji):
         try:
             dprint(f"{Fore.BLUE}Attempting to react")
             await asyncio.sleep(random.uniform(0.55, 1.08))
-            await reaction.message.add_reaction(emoji)
+            if not self.still_ready(drop):
+                return
+            with self.metrics.time("react"):
+                await drop.message.add_reaction(emoji)
+            latency = time.perf_counter() - drop.start
+            self.metrics.observe("end_to_end", latency)
         except discord.errors.Forbidden as oopsie:
             dprint(f"{Fore.RED}Fuck:\n{oopsie}")
+            self.store.grab(drop, "failed")
             return
-        self.timer += 60
+        self.store.grab(drop, "reacted", latency)
+        self.cooldowns.add("grab", 60)
         self.missed += 1
+        self.store.counts(self.collected, self.missed)
         dprint(f"{Fore.BLUE}Reacted with {emoji} successfully{Fore.RESET}")
 
-    async def cooldown(self):
-        while True:
-            await asyncio.sleep(1)
-            if self.timer > 0:
-                self.timer -= 1
-                if title:
-                    await asyncio.create_subprocess_shell(
-                        f"title Karuta Sniper {v} - Collected {self.collected} cards - Missed {self.missed} cards - On cooldown for {self.timer} seconds"
-                    )
-            elif title:
-                await asyncio.create_subprocess_shell(
-                    f"title Karuta Sniper {v} - Collected {self.collected} cards - Missed {self.missed} cards - Ready"
-                )
-
-    async def update_files(self):
-        with open("keywords\\characters.txt") as ff:
-            self.chars = ff.read().splitlines()
-
-        with open("keywords\\animes.txt") as ff:
-            self.animes = ff.read().splitlines()
-
-        with open("keywords\\aniblacklist.txt") as ff:
-            self.aniblacklist = ff.read().splitlines()
-
-        with open("keywords\\charblacklist.txt") as ff:
-            self.charblacklist = ff.read().splitlines()
-        tprint(
-            f"{Fore.MAGENTA}Loaded {len(self.animes)} animes, {len(self.aniblacklist)} blacklisted animes, {len(self.chars)} characters, {len(self.charblacklist)} blacklisted characters")
-
-    async def filewatch(self, path):
-        bruh = api.FileWatch(path)
-        dprint(f"Filewatch activated for {path}")
+    async def status(self):
+        # the title only changes when a cooldown moves (which is also when the counters
+        # change) and while counting down, and is only written when the text is different
+        last = None
         while True:
-            await asyncio.sleep(2)
-            if bruh.watch():
-                await self.update_files()
+            left = self.cooldowns.remaining("grab")
+            state = f"On cooldown for {round(left)} seconds" if left > 0 else "Ready"
+            text = f"Karuta Sniper {v} - Collected {self.collected} cards - Missed {self.missed} cards - {state}"
+            if text != last:
+                set_title(text)
+                last = text
+            await self.cooldowns.changed(min(STATUS_INTERVAL, left) if left > 0 else None)
+
+    async def update_files(self, paths=KEYWORD_FILES):
+        for path in paths:
+            name = KEYWORD_FILES[path]
+            with open(path) as ff:
+                setattr(self, name, ff.read().splitlines())
+        if self.pipeline.matcher is None:
+            self.pipeline.matcher = Matcher(self.chars, self.animes, self.charblacklist, self.aniblacklist)
+            tprint(
+                f"{Fore.MAGENTA}Loaded {len(self.animes)} animes, {len(self.aniblacklist)} blacklisted animes, {len(self.chars)} characters, {len(self.charblacklist)} blacklisted characters")
+            return
+        for path in paths:
+            name = KEYWORD_FILES[path]
+            added, removed = self.pipeline.matcher.update(name, getattr(self, name))
+            tprint(f"{Fore.MAGENTA}Reloaded {path}: {added} added, {removed} removed")
+
+    async def files_changed(self, paths):
+        if "config.json" in paths:
+            self.reload_config()
+        changed = [path for path in KEYWORD_FILES if path in paths]
+        if changed:
+            try:
+                await self.update_files(changed)
+            except (OSError, ValueError) as e:
+                tprint(f"{Fore.RED}Could not reload keywords: {e!r}{Fore.RESET}")
 
-    async def configwatch(self, path):
-        bruh = api.FileWatch(path)
-        while True:
-            await asyncio.sleep(1)
-            if bruh.watch():
-                with open("config.json") as ff:
-                    config = json.load(ff)
-                    global accuracy, prioritize_watermelon
-                    accuracy = float(config["accuracy"])
-                    prioritize_watermelon = config.get("event_settings", {}).get("prioritize_watermelon", True)
+    def reload_config(self):
+        try:
+            with open("config.json") as ff:
+                settings = read_settings(json.load(ff))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            tprint(f"{Fore.RED}config.json not reloaded, keeping the old settings: {e!r}{Fore.RESET}")
+            return
+        globals().update(settings)
+        # the pool, downloader, log and metrics keep the settings they were started with
+        self.pipeline.batch = batch_ocr
+        self.pipeline.check_print = cprint
+        self.pipeline.min_confidence = float(digit_settings.get("min_confidence", 0.5))
+        self.pending.timeout = grab_timeout
+        self.ingress.set_channels(channels)
+        dprint("Reloaded config.json")
 
     async def autodrop(self):
         channel = self.get_channel(autodropchannel)
+        self.cooldowns.set("drop", dropdelay + random.randint(randmin, randmax))
         while True:
-            await asyncio.sleep(dropdelay + random.randint(randmin, randmax))
-            if self.timer != 0:
-                await asyncio.sleep(self.timer)
+            await self.cooldowns.wait("drop", "grab")
             async with channel.typing():
                 await asyncio.sleep(random.uniform(0.2, 1))
             await channel.send("kd")
+            self.cooldowns.set("drop", dropdelay + random.randint(randmin, randmax))
             tprint(f"{Fore.LIGHTWHITE_EX}Auto Dropped Cards")
 
+    def write_failed(self, what, e):
+        self.metrics.inc("errors_total", stage=what)
+        tprint(f"{Fore.RED}Couldn't write the {what}: {e!r}{Fore.RESET}")
+
+    def ocr_failed(self, e):
+        self.metrics.inc("errors_total", stage="ocr")
+        tprint(f"{Fore.RED}The OCR workers didn't start, drops can't be read until this is fixed: {e!r}{Fore.RESET}")
+
+    def in_background(self, coro, on_error):
+        task = asyncio.get_running_loop().create_task(coro)
+        self.background.add(task)
+        task.add_done_callback(lambda t: self.background_done(t, on_error))
+        return task
+
+    def background_done(self, task, on_error):
+        self.background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            on_error(task.exception())
+
+    async def update_check(self):
+        return await self.downloader.text(update_url)
+
+    async def close(self):
+        if self.watcher is not None:
+            self.watcher.close()
+        for task in list(self.drop_tasks):
+            task.cancel()
+        await self.downloader.close()
+        await self.metrics.close()
+        await self.log.close()
+        await self.store.close()
+        await self.profiler.close()
+        # nothing to save if we're closed before the ocr side was built
+        if self.pipeline is not None:
+            if self.warming is not None:
+                self.warming.cancel()
+            await asyncio.gather(*self.background, return_exceptions=True)
+            await self.archive.close()
+            self.ocr_pool.shutdown()
+            self.ocr_cache.save()
+            if self.art_index is not None:
+                self.art_index.save()
+            if self.digits is not None:
+                self.digits.save()
+        await super().close()
+
     async def afterclick(self):
         dprint(f"Clicked on Button")
-        self.timer += 60
+        self.cooldowns.add("grab", 60)
         self.missed += 1
 
+def set_title(text):
+    # straight to the console instead of spawning a `title` shell every time
+    ctypes.windll.kernel32.SetConsoleTitleW(text)
+
+def tesseract_version():
+    # pytesseract is only imported by the ocr workers otherwise, and this runs tesseract once
+    import pytesseract
+    try:
+        return pytesseract.get_tesseract_version()
+    except pytesseract.TesseractNotFoundError as e:
+        return repr(e)
+
 def current_time():
     return datetime.now().strftime("%H:%M:%S")
 
@@ -583,6 +877,21 @@ def isbutton(data):
     else:
         return False
 
+def emoji(drop, b):
+    if drop.watermelon_pos is not None and b == drop.watermelon_pos:
+        return "🍉"
+    match b:
+        case 0:
+            return "1️⃣"
+        case 1:
+            return "2️⃣"
+        case 2:
+            return "3️⃣"
+        case 3:
+            return "4️⃣"
+        case 4:
+            return "5️⃣"
+
 def tprint(message):
     if timestamp:
         print(f"{Fore.LIGHTBLUE_EX}{current_time()} | {Fore.RESET}{message}")
@@ -597,20 +906,18 @@ def vprint(message):
     if verbose:
         tprint(f"{Fore.CYAN}{message}{Fore.WHITE}")
 
-def update_check():
-    return requests.get(url=update_url).text
-
-if token == "":
-    inp = input(f"{Fore.RED}No token found, would you like to find tokens from your pc? (y/n): {Fore.RESET}")
-    if inp == "y":
-        token = api.get_tokens(False)
-        input("Press any key to exit...")
-
-client = Main(guild_subscriptions=False)
-tprint(f"{Fore.GREEN}Starting Bot{Fore.RESET}")
-try:
-    client.run(token)
-except KeyboardInterrupt:
-    tprint(f"{Fore.RED}Ctrl-C detected\nExiting...{Fore.RESET}")
-    client.close()
-    exit()
+if __name__ == "__main__":
+    if token == "":
+        inp = input(f"{Fore.RED}No token found, would you like to find tokens from your pc? (y/n): {Fore.RESET}")
+        if inp == "y":
+            token = api.get_tokens(False)
+            input("Press any key to exit...")
+
+    client = Main(guild_subscriptions=False)
+    tprint(f"{Fore.GREEN}Starting Bot{Fore.RESET}")
+    try:
+        client.run(token)
+    except KeyboardInterrupt:
+        tprint(f"{Fore.RED}Ctrl-C detected\nExiting...{Fore.RESET}")
+        client.close()
+        exit()
@@ -0,0 +1,98 @@
+# times lib.decide.choose on made up drops and checks it against the rules: a fully read
+# drop gets the best ranked card, and a decision called final on a partly read drop is
+# the same one whatever the unread fields turn out to be
+# python -m tools.bench_decide [--drops 100000] [--cards 4] [--checks 2000]
+import argparse
+import random
+import time
+
+from lib.decide import RANK, Card, choose
+
+
+def read(rate):
+    # True/False like a read field, hits rare like in real drops
+    return random.random() < rate
+
+
+def full_card(pn):
+    return Card(read(0.1), read(0.15), read(0.05), read(0.05), read(0.05), random.randint(1, 2 * pn))
+
+
+def partly(card):
+    # some fields not read yet, the way the pipeline reads them: a blacklist hit needs its text
+    character = random.random() < 0.7
+    anime = random.random() < 0.5
+    prin = random.random() < 0.4 and character and anime
+    return Card(
+        card.character if character else None, card.anime if anime else None,
+        card.charblacklisted if character else None, card.aniblacklisted if anime else None,
+        card.listed if character and anime else None, card.print if prin else None
+    )
+
+
+def complete(card, pn):
+    # one way the unread fields of a card could come out
+    fresh = full_card(pn)
+    return Card(*(mine if mine is not None else other for mine, other in zip(card, fresh)))
+
+
+def reference(cards, pn):
+    # the rules spelled out one card at a time
+    best = None
+    for i, c in enumerate(cards):
+        clean = not c.charblacklisted and not c.aniblacklisted
+        if c.character and clean:
+            reason = "character"
+        elif c.anime and clean:
+            reason = "anime"
+        elif not c.listed and c.print <= pn:
+            reason = "print"
+        else:
+            continue
+        rank = (RANK[reason], -c.print if reason == "print" else 0, -i)
+        if best is None or rank > best[0]:
+            best = rank, i, reason
+    return (None, None) if best is None else best[1:]
+
+
+def check(args):
+    wrong = unsafe = finals = 0
+    for _ in range(args.checks):
+        cards = [full_card(args.print_number) for _ in range(args.cards)]
+        d = choose(cards, args.print_number)
+        wrong += (d.grab, d.reason) != reference(cards, args.print_number) or not d.final
+        partial = [partly(c) for c in cards]
+        d = choose(partial, args.print_number)
+        if not d.final:
+            continue
+        finals += 1
+        for _ in range(20):
+            filled = [complete(c, args.print_number) for c in partial]
+            if reference(filled, args.print_number) != (d.grab, d.reason):
+                unsafe += 1
+                break
+    print(f"checks: {wrong}/{args.checks} fully read drops decided wrong, "
+          f"{unsafe}/{finals} early decisions that unread fields could have changed")
+
+
+def bench(args):
+    drops = [[partly(full_card(args.print_number)) for _ in range(args.cards)] for _ in range(args.drops)]
+    t = time.perf_counter()
+    for cards in drops:
+        choose(cards, args.print_number)
+    per = (time.perf_counter() - t) / len(drops) * 1e6
+    final = sum(choose(cards, args.print_number).final for cards in drops)
+    print(f"choose: {per:.2f} us per {args.cards} card drop, {final / len(drops):.0%} of partly read drops already final")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--drops", type=int, default=100000)
+    parser.add_argument("--cards", type=int, default=4)
+    parser.add_argument("--checks", type=int, default=2000)
+    parser.add_argument("--print-number", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    check(args)
+    bench(args)
@@ -0,0 +1,132 @@
+# feeds made up gateway payloads straight into discord.py's parsers, with and without
+# lib.ingress in front and with the default or the lean cache, and prints the cpu time
+# and python memory per 10k events. guilds aren't cached here, so authors come out as
+# plain users instead of members and the real savings in a big server are higher
+# python -m tools.bench_ingress [--events 10000] [--relevant 0.02] [--channels 8]
+import argparse
+import gc
+import itertools
+import random
+import time
+import tracemalloc
+
+import discord
+
+from lib.ingress import KARUTA, Ingress
+
+ids = itertools.count(1_100_000_000_000_000_000)
+GUILD = str(next(ids))
+
+
+class User:
+    def __init__(self, id):
+        self.id = id
+
+
+def snowflake():
+    return str(next(ids))
+
+
+def author(user_id):
+    return {"id": user_id, "username": f"user{user_id[-4:]}", "discriminator": "0", "avatar": None, "global_name": None}
+
+
+def message(channel, user_id, content):
+    return {
+        "id": snowflake(), "channel_id": channel, "guild_id": GUILD, "author": author(user_id),
+        "member": {"roles": [], "joined_at": "2023-01-01T00:00:00+00:00", "deaf": False, "mute": False, "flags": 0},
+        "content": content, "timestamp": "2024-01-01T00:00:00+00:00", "edited_timestamp": None, "tts": False,
+        "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": [], "embeds": [],
+        "pinned": False, "type": 0, "flags": 0, "components": [],
+    }
+
+
+def events(count, watched, others, relevant):
+    # mostly chatter in channels nobody watches, `relevant` of them karuta in a watched one
+    users = [snowflake() for _ in range(200)]
+    out = []
+    for _ in range(count):
+        if random.random() < relevant:
+            out.append(("MESSAGE_CREATE", message(random.choice(watched), str(KARUTA), "is dropping 3 cards!")))
+            continue
+        channel = random.choice(others)
+        user = random.choice(users)
+        kind = random.random()
+        if kind < 0.7:
+            out.append(("MESSAGE_CREATE", message(channel, user, "lol " * random.randint(1, 20))))
+        elif kind < 0.85:
+            out.append(("TYPING_START", {"channel_id": channel, "guild_id": GUILD, "user_id": user, "timestamp": 1704067200}))
+        elif kind < 0.95:
+            out.append(("MESSAGE_REACTION_ADD", {
+                "channel_id": channel, "guild_id": GUILD, "message_id": snowflake(), "user_id": user,
+                "emoji": {"id": None, "name": "👍"}, "type": 0, "burst": False,
+            }))
+        else:
+            update = message(channel, user, "edited")
+            update["edited_timestamp"] = "2024-01-01T00:00:01+00:00"
+            out.append(("MESSAGE_UPDATE", update))
+    return out
+
+
+def client(ingress, lean, watched):
+    kwargs = {"guild_subscriptions": False}
+    if lean:
+        kwargs.update(max_messages=None, member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+    c = discord.Client(**kwargs)
+    c._connection.user = User(int(snowflake()))
+    if ingress:
+        Ingress(watched).install(c._connection.parsers)
+    return c
+
+
+def feed(c, payloads):
+    parsers = c._connection.parsers
+    for event, data in payloads:
+        parsers[event](data)
+
+
+def run(ingress, lean, payloads, watched):
+    # cpu first without tracemalloc (it slows everything down), then memory on a fresh client
+    c = client(ingress, lean, watched)
+    gc.collect()
+    t = time.process_time()
+    feed(c, payloads)
+    cpu = time.process_time() - t
+    c = client(ingress, lean, watched)
+    gc.collect()
+    tracemalloc.start()
+    feed(c, payloads)
+    gc.collect()
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu, kept, peak
+
+
+def main(args):
+    random.seed(args.seed)
+    watched = [snowflake() for _ in range(args.channels)]
+    others = [snowflake() for _ in range(args.channels * 20)]
+    payloads = events(args.events, watched, others, args.relevant)
+    scale = 10000 / len(payloads)
+    print(f"{len(payloads)} events, {args.relevant:.0%} karuta in a watched channel, numbers per 10k events")
+    base = None
+    for name, ingress, lean in (
+            ("default", False, False), ("lean cache", False, True), ("ingress", True, False), ("ingress+lean", True, True)
+    ):
+        cpu, kept, peak = run(ingress, lean, payloads, watched)
+        cpu, kept, peak = cpu * scale * 1000, kept * scale / 1024, peak * scale / 1024
+        line = f"{name:13} cpu {cpu:8.1f} ms   kept {kept:8.0f} KB   peak {peak:8.0f} KB"
+        if base is None:
+            base = cpu, kept
+        else:
+            line += f"   saves {base[0] - cpu:7.1f} ms  {base[1] - kept:7.0f} KB"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--relevant", type=float, default=0.02, help="share of events that are karuta in a watched channel")
+    parser.add_argument("--channels", type=int, default=8, help="watched channels, 20x as many unwatched ones")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
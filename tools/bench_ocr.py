@@ -0,0 +1,100 @@
+# compares per-region tesseract calls against the batched single-page read, and with
+# --preprocess the same two with the crops run through lib/preprocess first
+# python -m tools.bench_ocr [--runs 5] [--preprocess] [--labels temp/labels.json]
+import argparse
+import glob
+import json
+import os
+import statistics
+import time
+
+import cv2
+import Levenshtein
+
+from lib.layouts import Layouts
+from lib.ocr import decode, read_drop
+from lib.pipeline import parse_print
+
+DROPS = ("card.webp", "tofu/card.webp")
+PREP = {"block": 15, "c": 10, "height": 32}
+
+
+def sample_sets():
+    # the saved crops in temp/char plus the regions cut fresh from the sample drops
+    char = {}
+    for kind in ("top", "bottom", "print"):
+        char[kind] = [cv2.imread(f, cv2.IMREAD_GRAYSCALE) for f in sorted(glob.glob(f"temp/char/{kind}*.png"))]
+    yield "char", char["top"], char["bottom"], char["print"]
+    layouts = Layouts()
+    for name in DROPS:
+        path = os.path.join("temp", name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            img = decode(f.read())
+        boxes = layouts.classify(img.shape[1], img.shape[0]).boxes
+        yield name, *([img[box] for box in boxes[kind]] for kind in ("top", "bottom", "print"))
+
+
+def bench(tops, bottoms, prints, batch, prep, runs):
+    times = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        out = read_drop(tops, bottoms, prints, batch, prep=prep)
+        times.append((time.perf_counter() - t) * 1000)
+    return out, times
+
+
+def score(out, label):
+    # exact reads and mean Levenshtein ratio against the labels, prints compared as numbers
+    exact = 0
+    ratios = []
+    for reads, field in zip(out, ("characters", "animes", "prints")):
+        for read, expected in zip(reads, label.get(field, [])):
+            if field == "prints":
+                read = parse_print(read)
+            exact += str(read) == str(expected)
+            ratios.append(Levenshtein.ratio(str(read), str(expected)))
+    return exact, len(ratios), statistics.fmean(ratios) if ratios else 0.0
+
+
+def main(runs, preprocess, labels):
+    modes = [("per-region", False, None), ("batched", True, None)]
+    if preprocess:
+        modes += [("per-region+pre", False, PREP), ("batched+pre", True, PREP)]
+    for name, tops, bottoms, prints in sample_sets():
+        print(f"== {name} ({len(tops)} cards, {len(tops) + len(bottoms) + len(prints)} regions)")
+        results = {}
+        for label, batch, prep in modes:
+            out, times = bench(tops, bottoms, prints, batch, prep, runs)
+            results[label] = out
+            line = f"{label:15} median {statistics.median(times):8.1f} ms   min {min(times):8.1f} ms"
+            if name in labels:
+                exact, total, ratio = score(out, labels[name])
+                line += f"   exact {exact}/{total}   ratio {ratio:.2f}"
+            print(line)
+        first = modes[0][0]
+        for other, _, _ in modes[1:]:
+            same = 0
+            total = 0
+            print(f"  {first} vs {other}")
+            for field, a_reads, b_reads in zip(("top", "bottom", "print"), results[first], results[other]):
+                for i, (a, b) in enumerate(zip(a_reads, b_reads)):
+                    total += 1
+                    same += a == b
+                    flag = "  " if a == b else "!="
+                    print(f"  {field}{i + 1:<2} {flag} {a!r:40} {b!r}")
+            print(f"  agreement {same}/{total}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--preprocess", action="store_true")
+    parser.add_argument("--labels", default="temp/labels.json")
+    args = parser.parse_args()
+    labels = {}
+    if args.labels and os.path.isfile(args.labels):
+        with open(args.labels, encoding="utf-8") as f:
+            labels = json.load(f)
+    main(args.runs, args.preprocess, labels)
@@ -0,0 +1,75 @@
+# fills the art index from the archive (archive_settings.path): every grabbed card karuta
+# confirmed is fingerprinted from the archived drop image, then every archived card is
+# looked up again to show how many of them the index names
+# python -m tools.build_art_index [--archive archive] [--out temp/art_index.json]
+import argparse
+import json
+import os
+import time
+
+from lib.artindex import ArtIndex, confirmed, fingerprint
+from lib.layouts import Layouts
+from lib.ocr import decode
+
+
+def archived(root):
+    # drop records with the name karuta gave the card that was grabbed on them
+    drops = {}
+    collected = {}
+    with open(os.path.join(root, "index.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if "collected" in record:
+                collected[record["drop"]] = record["collected"]
+            elif "image" in record:
+                drops[record["drop"]] = record
+    for drop_id, record in drops.items():
+        yield record, collected.get(drop_id)
+
+
+def main(args):
+    index = ArtIndex(path=args.out, distance=args.distance, margin=args.margin)
+    index.load()
+    before = len(index)
+    layouts = Layouts()
+    cards = []
+    added = skipped = missing = 0
+    for record, character in archived(args.archive):
+        path = os.path.join(args.archive, record["image"])
+        if not os.path.isfile(path):
+            # evicted since
+            missing += 1
+            continue
+        with open(path, "rb") as f:
+            img = decode(f.read())
+        layout = layouts.classify(img.shape[1], img.shape[0])
+        boxes = layout.boxes.get("art", [])[:layout.count(img.shape[1])]
+        hashes = [fingerprint(img[box]) for box in boxes]
+        grab = record.get("grab")
+        cards += [(h, i == grab and character) for i, h in enumerate(hashes)]
+        if character is None or grab is None or grab >= len(hashes):
+            continue
+        reads, animes = record.get("characters") or [], record.get("animes") or []
+        read = reads[grab] if grab < len(reads) else None
+        anime = animes[grab] if grab < len(animes) else None
+        if confirmed(read, character) and index.add(hashes[grab], character, anime):
+            added += 1
+        else:
+            skipped += 1
+    index.save()
+    print(f"{len(index)} cards in {args.out} ({before} before): {added} added, {skipped} skipped, {missing} images evicted")
+    t = time.perf_counter()
+    named = [index.lookup(h) for h, _ in cards]
+    ms = (time.perf_counter() - t) * 1000 / max(1, len(cards))
+    wrong = sum(1 for found, (_, character) in zip(named, cards) if found and character and found[0] != character)
+    print(f"{sum(found is not None for found in named)}/{len(cards)} archived cards named by their art, "
+          f"{wrong} of the collected ones wrong, {ms:.3f} ms per lookup")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archive", default="archive")
+    parser.add_argument("--out", default="temp/art_index.json")
+    parser.add_argument("--distance", type=int, default=16)
+    parser.add_argument("--margin", type=int, default=32)
+    main(parser.parse_args())
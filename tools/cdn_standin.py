@@ -0,0 +1,82 @@
+# local stand-in for the discord cdn, serves the sample drops in temp/
+# python -m tools.cdn_standin            -> serve until ctrl-c
+# python -m tools.cdn_standin --check    -> fetch every sample through lib.download and decode it
+import argparse
+import asyncio
+import os
+import time
+
+from aiohttp import web
+
+from lib.download import Downloader
+from lib.ocr import decode
+
+ROOT = "temp"
+
+
+def samples(root=ROOT):
+    for folder, _, files in os.walk(root):
+        for name in sorted(files):
+            if name.endswith((".webp", ".png")):
+                yield os.path.relpath(os.path.join(folder, name), root).replace(os.sep, "/")
+
+
+def make_app(root=ROOT, delay=0.0):
+    async def attachment(request):
+        if delay:
+            await asyncio.sleep(delay)
+        path = os.path.normpath(os.path.join(root, request.match_info["name"]))
+        if not path.startswith(os.path.normpath(root)) or not os.path.isfile(path):
+            raise web.HTTPNotFound()
+        # query strings (format=, ex=, hm=...) are accepted and ignored like the real cdn does for unknown params
+        return web.FileResponse(path)
+
+    app = web.Application()
+    app.router.add_get("/attachments/{name:.+}", attachment)
+    return app
+
+
+async def start(host="127.0.0.1", port=0, root=ROOT, delay=0.0):
+    runner = web.AppRunner(make_app(root, delay))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}/attachments/"
+
+
+async def check(base, root=ROOT):
+    downloader = Downloader(timeout=5)
+    try:
+        for name in samples(root):
+            t = time.perf_counter()
+            data = await downloader.fetch_image(base + name + "?ex=0&is=0&hm=0", "png")
+            img = decode(data)
+            print(f"{name:28} {len(data):8} bytes  {img.shape}  {(time.perf_counter() - t) * 1000:.2f} ms")
+    finally:
+        await downloader.close()
+
+
+async def main(args):
+    runner, base = await start(args.host, args.port, args.root, args.delay)
+    print(f"Serving {args.root} at {base}")
+    try:
+        if args.check:
+            await check(base, args.root)
+        else:
+            await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--root", default=ROOT)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds of latency added to every response")
+    parser.add_argument("--check", action="store_true")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,83 @@
+# drives lib.cooldown.Cooldowns with a fake clock: add/set/reset and the waiters are
+# checked against the clock only, none of the cooldowns take real time to run out
+# python -m tools.check_cooldowns
+import asyncio
+import time
+
+from lib.cooldown import Cooldowns
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.cooldowns = None
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+        self.cooldowns.tick()
+
+
+async def settle():
+    # let woken waiters run
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def run():
+    clock = FakeClock()
+    cooldowns = clock.cooldowns = Cooldowns(clock)
+    failed = []
+
+    def check(name, ok):
+        print(f"{'ok  ' if ok else 'FAIL'} {name}")
+        if not ok:
+            failed.append(name)
+
+    cooldowns.add("grab", 60)
+    check("add counts from now", cooldowns.remaining("grab") == 60)
+    cooldowns.add("grab", 60)
+    check("add stacks on a running cooldown", cooldowns.remaining("grab") == 120)
+    clock.advance(130)
+    check("runs out when the clock passes it", cooldowns.ready("grab"))
+    cooldowns.add("grab", 60)
+    check("add after running out counts from now again", cooldowns.remaining("grab") == 60)
+    cooldowns.set("grab", 10)
+    check("set replaces the deadline", cooldowns.remaining("grab") == 10)
+    cooldowns.reset("grab")
+    check("reset makes it ready", cooldowns.ready("grab"))
+
+    cooldowns.set("drop", 600)
+    cooldowns.set("grab", 540)
+    waiter = asyncio.get_running_loop().create_task(cooldowns.wait("drop", "grab"))
+    await settle()
+    clock.advance(550)
+    await settle()
+    check("wait keeps waiting on the longest cooldown", not waiter.done())
+    clock.advance(50)
+    await settle()
+    check("wait returns once the clock passes every cooldown", waiter.done())
+
+    cooldowns.set("grab", 540)
+    waiter = asyncio.get_running_loop().create_task(cooldowns.wait("grab"))
+    await settle()
+    cooldowns.reset("grab")
+    await settle()
+    check("reset wakes a waiter without the clock moving", waiter.done())
+
+    changed = asyncio.get_running_loop().create_task(cooldowns.changed(3600))
+    await settle()
+    cooldowns.add("grab", 60)
+    await settle()
+    check("changed returns True when a deadline moves", changed.done() and changed.result() is True)
+    check("changed returns False on timeout", await cooldowns.changed(0) is False)
+    return failed
+
+
+if __name__ == "__main__":
+    t = time.perf_counter()
+    failed = asyncio.run(run())
+    print(f"{len(failed)} failed, {time.perf_counter() - t:.3f}s of real time")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,261 @@
+# drives main.Main with made up discord events, no gateway and no account involved.
+# drops point at tools.cdn_standin, every button click / reaction is timed from the
+# moment the drop was dispatched, and the loop lag and python memory are sampled
+# python -m tools.loadtest [--duration 60] [--drops 2] [--chatter 50] [--channels 8] [--want Musharna]
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import main
+from lib.matcher import Matcher
+from tools.cdn_standin import samples, start
+from tools.replay_bench import keywords
+
+KARUTA = 646937666251915264
+BUTTON_CHANNELS = [648044573536550922, 776520559621570621, 858004885809922078, 857978372688445481]
+ids = itertools.count(1_000_000_000_000_000_000)
+
+
+class Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class Channel:
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+    async def send(self, content):
+        pass
+
+
+class Button:
+    def __init__(self, harness, drop_id):
+        self.harness = harness
+        self.drop_id = drop_id
+        self.disabled = False
+
+    async def click(self):
+        self.harness.grabbed(self.drop_id)
+
+
+class Message:
+    def __init__(self, harness, channel, content, author=KARUTA, attachments=()):
+        self.harness = harness
+        self.id = next(ids)
+        self.channel = channel
+        self.content = content
+        self.author = Obj(id=author)
+        self.attachments = list(attachments)
+        self.components = []
+
+    async def add_reaction(self, emoji):
+        self.harness.grabbed(self.id)
+
+
+def percentiles(values, scale=1000):
+    if not values:
+        return "n/a"
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(p / 100 * len(values)))] * scale
+    return f"p50 {pick(50):8.1f}  p90 {pick(90):8.1f}  p99 {pick(99):8.1f}  max {values[-1] * scale:8.1f}"
+
+
+class Harness:
+    def __init__(self, client, args, base):
+        self.client = client
+        self.args = args
+        self.base = base
+        self.drops = [name for name in samples() if name.endswith(".webp")]
+        self.user = client.user
+        # half the channels use buttons, the rest reactions
+        cids = BUTTON_CHANNELS[:args.channels // 2]
+        cids += [next(ids) for _ in range(args.channels - len(cids))]
+        self.channels = [Channel(cid, f"load-{n}") for n, cid in enumerate(cids)]
+        self.sent = {}
+        self.latency = []
+        self.lag = []
+        self.memory = []
+        self.counts = {"drops": 0, "grabs": 0, "chatter": 0, "edits": 0, "reactions": 0, "took": 0, "blessings": 0}
+
+    def grabbed(self, drop_id):
+        sent = self.sent.pop(drop_id, None)
+        if sent is None:
+            return
+        self.latency.append(time.perf_counter() - sent[0])
+        self.counts["grabs"] += 1
+        asyncio.get_running_loop().call_later(
+            random.uniform(0.2, 0.6), self.took, sent[1]
+        )
+
+    def took(self, channel):
+        code = "".join(random.choices("abcdefghijklmnopqrstuvwxyz0123456789", k=6))
+        self.dispatch("message", Message(
+            self, channel, f"<@{self.user.id}> took the **Musharna** card `{code}`!"
+        ))
+        self.counts["took"] += 1
+
+    def dispatch(self, event, *args):
+        self.client.dispatch(event, *args)
+
+    async def drop(self):
+        channel = random.choice(self.channels)
+        url = f"{self.base}{random.choice(self.drops)}?ex=0&is=0&hm=0"
+        message = Message(
+            self, channel, f"<@{self.user.id}> is dropping 3 cards!", attachments=[Obj(url=url)]
+        )
+        self.sent[message.id] = (time.perf_counter(), channel)
+        self.dispatch("message", message)
+        self.counts["drops"] += 1
+        # karuta enables the buttons / adds its reactions a moment after the drop, often
+        # before the bot has read it. sent once by default, --repeats sends it again like
+        # other people's reactions would be
+        for _ in range(self.args.repeats):
+            await asyncio.sleep(self.args.edit_delay)
+            if message.id not in self.sent:
+                return
+            if main.isbutton(channel.id):
+                after = Message(self, channel, message.content)
+                after.id = message.id
+                after.components = [Obj(children=[Button(self, message.id) for _ in range(4)])]
+                self.dispatch("raw_message_edit", Obj(message_id=message.id, channel_id=channel.id, message=after))
+                self.counts["edits"] += 1
+            else:
+                self.dispatch("raw_reaction_add", Obj(
+                    message_id=message.id, channel_id=channel.id, user_id=next(ids), emoji="1️⃣"
+                ))
+                self.counts["reactions"] += 1
+
+    def chatter(self):
+        channel = random.choice(self.channels)
+        if random.random() < 0.02:
+            content, author = f"<@{self.user.id}>, your Evasion blessing has activated!", KARUTA
+            self.counts["blessings"] += 1
+        elif random.random() < 0.5:
+            content, author = random.choice(("k!view", "kc", "kd", "lol", "nice pull")), next(ids)
+        else:
+            content, author = "Your vote has been counted.", KARUTA
+        self.dispatch("message", Message(self, channel, content, author))
+        self.counts["chatter"] += 1
+        # people reacting to and editing other messages, none of which the bot waits on
+        if random.random() < 0.5:
+            self.dispatch("raw_reaction_add", Obj(message_id=next(ids), channel_id=channel.id, user_id=next(ids), emoji="👍"))
+        else:
+            edited = Message(self, channel, content, author)
+            self.dispatch("raw_message_edit", Obj(message_id=edited.id, channel_id=channel.id, message=edited))
+
+    async def pace(self, rate, action):
+        # poisson arrivals at `rate` per second, on an absolute schedule so sleep
+        # granularity doesn't lower the rate
+        if rate <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        due = loop.time()
+        while True:
+            due += random.expovariate(rate)
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            result = action()
+            if asyncio.iscoroutine(result):
+                loop.create_task(result)
+
+    async def watch_loop(self, interval=0.05):
+        while True:
+            t = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag.append(max(0.0, time.perf_counter() - t - interval))
+
+    async def watch_memory(self):
+        while True:
+            self.memory.append(tracemalloc.get_traced_memory()[0])
+            await asyncio.sleep(1)
+
+    async def run(self):
+        tasks = [
+            asyncio.create_task(self.pace(self.args.drops, self.drop)),
+            asyncio.create_task(self.pace(self.args.chatter, self.chatter)),
+            asyncio.create_task(self.watch_loop()),
+            asyncio.create_task(self.watch_memory()),
+        ]
+        started = time.perf_counter()
+        await asyncio.sleep(self.args.duration)
+        for task in tasks:
+            task.cancel()
+        # let the drops still in flight finish
+        deadline = time.perf_counter() + self.args.drain
+        while self.client.drop_tasks and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        print(f"ran {elapsed:.1f}s over {len(self.channels)} channels")
+        for name, count in self.counts.items():
+            print(f"  {name:10} {count:7}  ({count / elapsed:7.2f}/s)")
+        print(f"  unanswered drops {len(self.sent)}  still running {len(self.client.drop_tasks)}")
+        print(f"end to end ms    {percentiles(self.latency)}")
+        print(f"loop lag ms      {percentiles(self.lag)}")
+        if self.memory:
+            mb = [m / 1024 / 1024 for m in self.memory]
+            print(f"python memory MB start {mb[0]:.1f}  end {mb[-1]:.1f}  peak {max(mb):.1f}  growth {mb[-1] - mb[0]:+.1f}")
+        for stage in ("queued", "download", "decode", "ocr_top", "ocr_bottom", "ocr_print", "digits", "match", "total", "click", "react"):
+            hist = self.client.metrics.stages.get(stage)
+            if hist is not None:
+                print(f"  {stage:10} ms  {percentiles(list(hist.recent))}")
+
+
+async def run(args):
+    runner, base = await start(delay=args.cdn_delay)
+    tmp = tempfile.mkdtemp(prefix="loadtest")
+    main.channels = frozenset()
+    main.loghits = main.logcollection = True
+    client = main.Main(guild_subscriptions=False)
+    # nothing the bot saves may end up next to the real logs and caches
+    client.log.path = os.path.join(tmp, "events.jsonl")
+    client.log.text_path = None
+    client.store.path = os.path.join(tmp, "karuta.db")
+    client._connection.user = Obj(id=next(ids), name="loadtest", discriminator="0000")
+    # karuta's grab cooldown would skip every drop after the first grab, the point here is throughput
+    client.cooldowns.add = lambda name, seconds: None
+    async with client:
+        await client.setup_hook()
+        await client.loading
+        client.ocr_cache.path = os.path.join(tmp, "ocr_cache.json")
+        client.archive.root = os.path.join(tmp, "archive")
+        if client.digits is not None:
+            client.digits.path = os.path.join(tmp, "digits.json")
+        await client.ocr_pool.warm()
+        chars, animes, charblacklist, aniblacklist = keywords()
+        client.chars, client.animes = chars + args.want, animes
+        client.charblacklist, client.aniblacklist = charblacklist, aniblacklist
+        client.pipeline.matcher = Matcher(client.chars, animes, charblacklist, aniblacklist)
+        harness = Harness(client, args, base)
+        main.channels = frozenset(channel.id for channel in harness.channels)
+        client.ingress.set_channels(main.channels)
+        client.ready = True
+        tracemalloc.start()
+        try:
+            harness.report(await harness.run())
+        finally:
+            tracemalloc.stop()
+            await client.close()
+            await runner.cleanup()
+    print(f"bot output went to {tmp}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=60, help="seconds of traffic")
+    parser.add_argument("--drops", type=float, default=2, help="drops per second over all channels")
+    parser.add_argument("--chatter", type=float, default=50, help="unrelated messages per second")
+    parser.add_argument("--channels", type=int, default=8)
+    parser.add_argument("--edit-delay", type=float, default=1.0, help="seconds until the buttons/reactions show up")
+    parser.add_argument("--repeats", type=int, default=1, help="how often the edit/reaction is sent per drop")
+    parser.add_argument("--cdn-delay", type=float, default=0.0, help="extra seconds per attachment download")
+    parser.add_argument("--drain", type=float, default=15, help="seconds to wait for drops still running at the end")
+    parser.add_argument("--want", nargs="*", default=["Musharna"], help="characters to add so drops are grabbed")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,205 @@
+# replays saved drop images through Pipeline.decide like on_message does (only the fields
+# that can change the grab are read), no discord involved. --read-all reads every field of
+# every card instead, to score the ocr against all the labels
+# python -m tools.replay_bench [folder] [--runs 20] [--labels temp/labels.json] [--keywords keywords]
+#   [--print-number 1000] [--art temp/art_index.json] [--read-all] [--out results.json] [--baseline old.json]
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import time
+from collections import Counter
+
+import Levenshtein
+
+from lib.artindex import ArtIndex
+from lib.digits import DigitReader
+from lib.matcher import Matcher
+from lib.ocrcache import OCRCache
+from lib.ocrpool import OCRPool
+from lib.pipeline import Drop, Pipeline
+
+STAGES = ("decode", "layout", "crop", "art", "digits", "ocr_top", "ocr_bottom", "ocr_print", "ocr", "prints", "match", "total")
+
+
+def find_drops(folder):
+    # a drop is a .webp, the pngs next to it are crops
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.endswith(".webp"):
+                yield os.path.relpath(os.path.join(root, name), folder).replace(os.sep, "/")
+
+
+def keywords(folder="keywords"):
+    lists = []
+    for name in ("characters.txt", "animes.txt", "charblacklist.txt", "aniblacklist.txt"):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                lists.append(f.read().splitlines())
+        else:
+            lists.append([])
+    return lists
+
+
+def percentiles(values):
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+    return {
+        "p50": pick(50) * 1000, "p90": pick(90) * 1000, "p99": pick(99) * 1000,
+        "mean": statistics.fmean(values) * 1000, "max": values[-1] * 1000
+    }
+
+
+def score(drop, label):
+    # exact reads per field and mean Levenshtein ratio of the reads against the labels,
+    # fields the decision never needed aren't counted
+    out = {}
+    for field, reads in (("characters", drop.charlist), ("animes", drop.anilist), ("prints", drop.printlist)):
+        expected = label.get(field)
+        if not expected:
+            continue
+        pairs = [(a, b) for a, b in zip(reads, expected) if a is not None]
+        if not pairs:
+            continue
+        out[field] = {
+            "exact": sum(str(a) == str(b) for a, b in pairs),
+            "total": len(pairs),
+            "ratio": statistics.fmean(Levenshtein.ratio(str(a), str(b)) for a, b in pairs) if pairs else 0.0
+        }
+    return out
+
+
+async def run(args):
+    pool = OCRPool(workers=args.workers, timeout=args.timeout)
+    pool.start()
+    await pool.warm()
+    cache = OCRCache(path="", size=args.cache)
+    digits = None
+    if not args.no_digits:
+        digits = DigitReader(path="")
+        digits.load()
+    art = None
+    if args.art:
+        art = ArtIndex(path=args.art)
+        art.load()
+    pipeline = Pipeline(
+        pool, cache, digits, batch=not args.per_region, check_print=args.print_number is not None or args.read_all,
+        art=art
+    )
+    pipeline.matcher = Matcher(*keywords(args.keywords))
+
+    labels = {}
+    if args.labels and os.path.isfile(args.labels):
+        with open(args.labels, encoding="utf-8") as f:
+            labels = json.load(f)
+
+    drops = []
+    for name in find_drops(args.folder):
+        with open(os.path.join(args.folder, name), "rb") as f:
+            drops.append((name, f.read()))
+    if not drops:
+        raise SystemExit(f"No drop images found in {args.folder}")
+
+    timings = {stage: [] for stage in STAGES}
+    accuracy = {}
+    decisions = {}
+    skipped = Counter()
+    started = time.perf_counter()
+    try:
+        for run_number in range(args.runs):
+            for name, data in drops:
+                if args.read_all:
+                    drop = await pipeline.read(data)
+                    pipeline.verdict(drop, pipeline.judge(drop, args.accuracy, args.blaccuracy, args.print_number))
+                else:
+                    drop = await pipeline.decide(
+                        data, Drop(), args.accuracy, args.blaccuracy, not args.no_watermelon, args.print_number
+                    )
+                for stage in STAGES:
+                    timings[stage].append(drop.timings.get(stage, 0.0))
+                for field, cards in drop.skipped.items():
+                    skipped[field] += len(cards)
+                if run_number == 0:
+                    decisions[name] = {"grab": drop.grab, "reason": drop.reason, "skipped": drop.skipped}
+                if run_number == 0 and name in labels:
+                    accuracy[name] = score(drop, labels[name])
+                    accuracy[name]["reads"] = {
+                        "characters": drop.charlist, "animes": drop.anilist, "prints": drop.printlist
+                    }
+    finally:
+        pool.shutdown()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": vars(args),
+        "drops": len(drops) * args.runs,
+        "drops_per_second": len(drops) * args.runs / elapsed,
+        # a stage that never ran on any drop isn't shown
+        "stages_ms": {stage: percentiles(values) for stage, values in timings.items() if any(values)},
+        "accuracy": accuracy,
+        "decisions": decisions,
+        "skipped_per_drop": {field: n / (len(drops) * args.runs) for field, n in skipped.items()},
+        "art_index": art.stats() if art is not None else None,
+        "ocr_cache": cache.stats() if args.cache else None
+    }
+
+
+def report(result, baseline=None):
+    print(f"{result['drops']} drops, {result['drops_per_second']:.2f} drops/s")
+    print(f"{'stage':10} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+    for stage, p in result["stages_ms"].items():
+        line = f"{stage:10} {p['p50']:9.2f} {p['p90']:9.2f} {p['p99']:9.2f} {p['max']:9.2f}"
+        if baseline and stage in baseline.get("stages_ms", {}):
+            old = baseline["stages_ms"][stage]["p50"]
+            if old:
+                line += f"  p50 {(p['p50'] - old) / old:+.0%} vs baseline"
+        print(line)
+    for name, d in result["decisions"].items():
+        grab = "nothing" if d["grab"] is None else f"card {d['grab'] + 1} ({d['reason']})"
+        print(f"{name}: grabs {grab}, skipped {d['skipped'] or 'nothing'}")
+    skipped = result["skipped_per_drop"]
+    print("fields skipped per drop:", ", ".join(f"{field} {n:.2f}" for field, n in skipped.items()) or "none")
+    if result["art_index"]:
+        print(result["art_index"])
+    for name, fields in result["accuracy"].items():
+        for field, s in fields.items():
+            if field != "reads":
+                print(f"{name} {field}: {s['exact']}/{s['total']} read exact, mean ratio {s['ratio']:.2f}")
+    if baseline:
+        print(f"baseline: {baseline['drops_per_second']:.2f} drops/s from {baseline['time']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?", default="temp")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--labels", default="temp/labels.json")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--cache", type=int, default=0, help="ocr cache size, 0 reads every crop every run")
+    parser.add_argument("--per-region", action="store_true", help="one tesseract run per region instead of batched")
+    parser.add_argument("--no-digits", action="store_true", help="send prints to tesseract too")
+    parser.add_argument("--accuracy", type=float, default=0.85)
+    parser.add_argument("--blaccuracy", type=float, default=0.7)
+    parser.add_argument("--keywords", default="keywords", help="folder with the keyword lists")
+    parser.add_argument("--print-number", type=int, help="grab prints up to this, like print_number with check_print")
+    parser.add_argument("--no-watermelon", action="store_true", help="like prioritize_watermelon off")
+    parser.add_argument("--art", help="art index to name cards from, like ocr_settings.art_index")
+    parser.add_argument("--read-all", action="store_true", help="read every field of every card, then decide")
+    parser.add_argument("--out", help="write the results as json")
+    parser.add_argument("--baseline", help="results json of an earlier run to compare against")
+    args = parser.parse_args()
+    result = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    report(result, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
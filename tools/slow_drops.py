@@ -0,0 +1,89 @@
+# lists the slow drops lib.profiler saved (profile_settings.path), or shows where the time
+# of one of them went: the time of each step, the stacks seen most often and the functions
+# the drop was in (running on the loop or waiting) most often
+# python -m tools.slow_drops [folder] [--path logs/slow] [--top 15]
+import argparse
+import json
+import os
+import re
+from collections import Counter
+
+
+def load(folder):
+    with open(os.path.join(folder, "profile.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def listing(args):
+    if not os.path.isdir(args.path):
+        print(f"nothing captured in {args.path}")
+        return
+    rows = []
+    for name in sorted(os.listdir(args.path)):
+        try:
+            record = load(os.path.join(args.path, name))
+        except (OSError, ValueError):
+            continue
+        slowest = max(record["timings"].items(), key=lambda t: t[1], default=("-", 0))
+        rows.append((name, record))
+        print(f"{name:<36} {record['elapsed'] * 1000:8.0f} ms  {record.get('layout') or '-':<8} "
+              f"grab {record['grab']} ({record['reason']})  slowest step {slowest[0]} {slowest[1] * 1000:.0f} ms")
+    if rows:
+        elapsed = sorted(r["elapsed"] for _, r in rows)
+        print(f"{len(rows)} slow drops, median {elapsed[len(elapsed) // 2] * 1000:.0f} ms, worst {elapsed[-1] * 1000:.0f} ms")
+
+
+def leaf(stack):
+    return stack.rsplit(";", 1)[-1]
+
+
+def show(args, folder):
+    if not os.path.isdir(folder):
+        folder = os.path.join(args.path, folder)
+    record = load(folder)
+    total = max(1, record["samples"])
+    print(f"drop {record['drop']} in {record['channel']} at {record['time']}: {record['elapsed'] * 1000:.0f} ms "
+          f"(threshold {record['threshold'] * 1000:.0f} ms), {record['samples']} samples every {record['interval'] * 1000:g} ms")
+    print(f"layout {record['layout']}, {record['cards']} cards, grab {record['grab']} ({record['reason']}), "
+          f"skipped {record['skipped'] or 'nothing'}")
+    print("characters", record["characters"])
+    print("animes", record["animes"])
+    print("prints", record["prints"])
+    print("\nsteps")
+    for stage, seconds in sorted(record["timings"].items(), key=lambda t: -t[1]):
+        print(f"  {stage:<20} {seconds * 1000:8.1f} ms")
+    stacks = [(stack, count) for stack, count in record["stacks"]]
+    waiting = sum(count for stack, count in stacks if leaf(stack).startswith("[waiting"))
+    print(f"\n{waiting / total:.0%} of the samples waiting, {1 - waiting / total:.0%} running on the event loop")
+    leaves = Counter()
+    inside = Counter()
+    for stack, count in stacks:
+        frames = stack.split(";")
+        # a waiting stack ends in what it waits on, the function that awaited it is more useful
+        leaves[frames[-2] if frames[-1].startswith("[waiting") and len(frames) > 1 else frames[-1]] += count
+        # by function, whatever line of it the sample was on
+        for frame in {re.sub(r":\d+\)$", ")", f) for f in frames}:
+            inside[frame] += count
+    print("\nwhere it was")
+    for frame, count in leaves.most_common(args.top):
+        print(f"  {count / total:6.1%}  {frame}")
+    print("\ninside (anywhere on the stack)")
+    for frame, count in inside.most_common(args.top):
+        print(f"  {count / total:6.1%}  {frame}")
+    print("\nstacks")
+    for stack, count in stacks[:args.top]:
+        print(f"  {count / total:6.1%}  {' > '.join(stack.split(';')[-4:])}")
+    images = sorted(name for name in os.listdir(folder) if name.endswith((".png", ".webp")))
+    print(f"\n{len(images)} images in {folder}: {', '.join(images)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder", nargs="?")
+    parser.add_argument("--path", default="logs/slow")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+    if args.folder:
+        show(args, args.folder)
+    else:
+        listing(args)
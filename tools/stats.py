@@ -0,0 +1,43 @@
+# what the bot has seen and done, from the sqlite store (store_settings.path)
+# python -m tools.stats [--db logs/karuta.db] [--days 30] [--top 20]
+import argparse
+import os
+import sqlite3
+import time
+
+from lib import store
+
+
+def main(args):
+    if not os.path.isfile(args.db):
+        print(f"{args.db} doesn't exist yet, it's written once the bot has seen a drop (store_settings.enabled)")
+        return
+    db = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    since = time.time() - args.days * 86400 if args.days else 0.0
+    sessions, collected, missed = store.totals(db)
+    print(f"{sessions} sessions, {collected} cards collected, {missed} missed (all time)")
+
+    print(f"\n== series, last {args.days or 'all'} days")
+    print(f"{'anime':40} {'seen':>6} {'grabbed':>8} {'rate':>6}")
+    for anime, seen, hits in store.hit_rate_by_anime(db, since, args.top):
+        print(f"{anime[:40]:40} {seen:6} {hits:8} {hits / seen:6.1%}")
+
+    total, wrong = store.misreads(db, since)
+    print(f"\n== ocr")
+    print(f"character names of collected cards read wrong: {wrong}/{total}" + (f" ({wrong / total:.1%})" if total else ""))
+    total, bad = store.bad_prints(db, since)
+    print(f"prints that didn't parse: {bad}/{total}" + (f" ({bad / total:.1%})" if total else ""))
+
+    print(f"\n== grab latency (drop message to click/reaction)")
+    print(f"{'day':12} {'grabs':>6} {'mean ms':>9} {'max ms':>9}")
+    for day, count, mean, worst in store.latency_by_day(db, since):
+        print(f"{day:12} {count:6} {mean:9.0f} {worst:9.0f}")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="logs/karuta.db")
+    parser.add_argument("--days", type=float, default=30, help="0 for everything")
+    parser.add_argument("--top", type=int, default=20)
+    main(parser.parse_args())